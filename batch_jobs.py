@@ -0,0 +1,139 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+
+class BatchJob:
+    """State, progress and event log for one background batch run"""
+
+    def __init__(self, description=""):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = 'queued'
+        self.total = None
+        self.done = 0
+        self.failed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.results = []            # slim per-image records in completion order
+        self.cancel_event = threading.Event()
+        self._events = []            # (seq, event_type, data)
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def publish(self, event_type, data):
+        """Append an event and wake any waiting event streams"""
+        with self._cond:
+            self._events.append((len(self._events) + 1, event_type, data))
+            self._cond.notify_all()
+
+    def events_after(self, seq, timeout=None):
+        """Events with sequence number > seq, waiting up to `timeout` seconds for new ones"""
+        with self._cond:
+            if len(self._events) <= seq and not self.finished and timeout:
+                self._cond.wait(timeout)
+            return self._events[seq:]
+
+    def set_status(self, status, error=None):
+        with self._cond:
+            self.status = status
+            self.error = error
+            if status == 'running':
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+        self.publish('status', self.snapshot())
+
+    def record_progress(self, done, total, result):
+        """progress_callback for BatchImageProcessor.process_directory"""
+        with self._cond:
+            self.total = total
+            if result is not None:
+                self.done = done
+                record = {"filename": result.get("filename"), "saved_as": result.get("saved_as")}
+                if "error" in result:
+                    self.failed += 1
+                    record["error"] = result["error"]
+                self.results.append(record)
+        if result is not None:
+            self.publish('progress', {"done": done, "total": total, **record})
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'job_id': self.id,
+                'description': self.description,
+                'status': self.status,
+                'total': self.total,
+                'done': self.done,
+                'failed': self.failed,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+    def results_since(self, offset=0):
+        with self._cond:
+            return self.results[offset:]
+
+
+class JobManager:
+    """Runs batch jobs on a small worker pool and keeps recent jobs for status queries"""
+
+    def __init__(self, max_concurrent=1, keep_finished=20):
+        self.keep_finished = keep_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="batch-job")
+
+    def submit(self, fn, description=""):
+        """Start fn(job) in the background and return the job; fn should honour job.cancel_event"""
+        job = BatchJob(description)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        if job.cancel_event.is_set():
+            job.set_status('cancelled')
+            return
+        job.set_status('running')
+        try:
+            fn(job)
+        except Exception as e:
+            logging.error(f"Batch job {job.id} failed: {e}")
+            job.set_status('failed', error=str(e))
+            return
+        job.set_status('cancelled' if job.cancel_event.is_set() else 'completed')
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+            job.publish('cancelling', job.snapshot())
+        return job
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+
+job_manager = JobManager(max_concurrent=int(os.environ.get('BATCH_JOB_CONCURRENCY', '1')))
@@ -0,0 +1,84 @@
+import os
+import json
+import threading
+import logging
+
+
+class BatchJournal:
+    """Append-only JSON Lines log of per-image results for one batch run.
+
+    Each record is flushed and fsync'd as soon as its image completes, so a
+    crash or container restart loses at most the images still in flight.
+    A truncated final line (crash mid-write) is ignored on load. Lookups only
+    keep byte offsets in memory, so rebuilding output from the journal runs
+    in roughly constant memory regardless of batch size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_output(cls, output_directory, output_file):
+        """Journal stored next to the batch results file, e.g. batch_results.journal.jsonl"""
+        base_name = os.path.splitext(output_file)[0]
+        return cls(os.path.join(output_directory, f"{base_name}.journal.jsonl"))
+
+    def reset(self):
+        with self._lock:
+            open(self.path, 'w', encoding='utf-8').close()
+
+    def append(self, result):
+        line = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _scan(self):
+        """Yield (offset, record) for every readable line"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line_no, line in enumerate(f, 1):
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logging.warning(f"Skipping unreadable journal line {line_no} in {self.path}")
+
+    def records(self):
+        """Yield journal records in the order they were written"""
+        for _, record in self._scan():
+            yield record
+
+    def latest_offsets(self):
+        """Map filename -> (offset, failed) of its most recent record"""
+        latest = {}
+        for offset, record in self._scan():
+            filename = record.get("filename")
+            if filename:
+                latest[filename] = (offset, "error" in record)
+        return latest
+
+    def completed(self):
+        """Filenames whose latest record succeeded; failed images are retried on resume"""
+        return {name for name, (_, failed) in self.latest_offsets().items() if not failed}
+
+    def iter_latest(self, filenames, offsets=None):
+        """Yield the latest record for each of `filenames` (in that order) that has one"""
+        if offsets is None:
+            offsets = self.latest_offsets()
+        if not offsets:
+            return
+        with open(self.path, 'rb') as f:
+            for filename in filenames:
+                entry = offsets.get(filename)
+                if entry is None:
+                    continue
+                f.seek(entry[0])
+                yield json.loads(f.readline())
@@ -1,207 +1,200 @@
 import os
+import time
 import base64
+import argparse
+from collections import deque
+import multiprocessing
+import threading
+from contextlib import ExitStack
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 from utils import _filename_clean_pattern
 import re
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-from groq import Groq
+from groq import BadRequestError
+from groq_clients import get_client, key_id
 import json
 from datetime import datetime, timezone
-from student_info import StudentInfo
+from rate_limiter import get_governor
+from hedging import get_hedge_policy
+from processing_modes import get_mode
+from singleflight import ocr_flights
+from packing import MAX_PACK_SIZE, PackSplitError, build_pack_messages, split_pack_response
+from response_parser import parse_response, tokenize, validate_poem_lines, word_count, zip_digits
+from ocr_cache import OCRResultCache, get_result_cache
+from batch_journal import BatchJournal
+from payload_cache import PayloadCache, get_payload_cache
+from payload_encoder import encode_image, payload_settings
+import metrics
+from profiling import RunProfiler, RunSummary, StageTimings
 
-# -----------------------------
-# Helpers for local validation
-# -----------------------------
-_WORD_RE = re.compile(r"[A-Za-z0-9']+")
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+MAX_COMPLETION_TOKENS = 2000
+# Rough per-image prompt cost for a <=1024px JPEG; corrected from usage after each call
+IMAGE_TOKEN_ESTIMATE = 1200
+
+
+# Completion budget for a packed request (several images' outputs in one response)
+PACK_MAX_COMPLETION_TOKENS = 8192
+
+
+def estimate_request_tokens(prompt_text, images=1, max_tokens=MAX_COMPLETION_TOKENS):
+    """Token reservation for one OCR request, used by the rate-limit governor before the call"""
+    return len(prompt_text) // 4 + IMAGE_TOKEN_ESTIMATE * images + max_tokens // 2
+
+
+# Encoder settings for API payloads (env: PAYLOAD_*); part of the payload cache key
+PAYLOAD_SETTINGS = payload_settings()
+
+
+def encode_payload(image_path):
+    """Encode an image into the base64 payload sent to Groq; returns (payload, stats).
+
+    Module-level so it can run in a preprocessing process pool. Encoded bytes
+    are kept in the shared disk payload cache, so re-OCRing an unchanged image
+    (other mode/model, retry) skips the decode and resize. stats records the
+    payload size, dimensions and encode wall/CPU time. Raises PayloadError rather
+    than ever sending the raw file.
+    """
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    cache = get_payload_cache()
+    cache_key = None
+    if cache is not None:
+        try:
+            cache_key = PayloadCache.make_key(image_path, PAYLOAD_SETTINGS)
+            data = cache.get(cache_key)
+            if data is not None:
+                return base64.b64encode(data).decode('utf-8'), {
+                    "bytes": len(data), "cached": True,
+                    "encode_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "cpu_ms": round((time.thread_time() - cpu_start) * 1000, 1)}
+        except OSError:
+            cache_key = None
+
+    data, stats = encode_image(image_path, PAYLOAD_SETTINGS)
+    if cache_key is not None:
+        cache.put(cache_key, data)
+    stats.update(cached=False, encode_ms=round((time.perf_counter() - start) * 1000, 1),
+                 cpu_ms=round((time.thread_time() - cpu_start) * 1000, 1))
+    return base64.b64encode(data).decode('utf-8'), stats
 
-def word_count(s: str) -> int:
-    return len(_WORD_RE.findall(s or ""))
 
-def zip_digits(zipcode: str):
-    if not zipcode or not isinstance(zipcode, str):
-        return []
-    return [int(d) for d in zipcode if d.isdigit()]
+def observe_payload(stats):
+    """Record an encode_payload result in the metrics (in this process: encodes may run in a pool)"""
+    if not stats:
+        return
+    encoder = stats.get("encoder", PAYLOAD_SETTINGS["encoder"])
+    decode_ms = stats.get("decode_ms", 0.0)
+    if not stats.get("cached"):
+        metrics.IMAGE_DECODE_SECONDS.observe(decode_ms / 1000)
+    metrics.IMAGE_ENCODE_SECONDS.observe((stats.get("encode_ms", 0.0) - decode_ms) / 1000, encoder=encoder,
+                                         cached=str(bool(stats.get("cached"))).lower())
+    metrics.PAYLOAD_BYTES.observe(stats.get("bytes", 0), encoder=encoder)
 
-def validate_poem_lines(lines, zipcode: str):
-    """Local validator (optional, independent of the model's table)"""
-    zip_pattern = zip_digits(zipcode) if zipcode and zipcode.isdigit() else []
+
+def _pipeline_metrics():
+    """Export the counters the caches, governor, single-flight group and hedger already keep"""
+    from ocr_cache import all_cache_stats
     rows = []
-    for i, need in enumerate(zip_pattern, start=1):
-        line = lines[i - 1] if i - 1 < len(lines) else ""
-        have = word_count(line)
-        ok = (have == need if need > 0 else have == 0)
-        rows.append(
-            {"line": i, "expected": need, "actual": have, "ok": ok, "text": line}
-        )
-    overall = bool(zip_pattern) and len(lines) == len(zip_pattern) and all(r["ok"] for r in rows)
-    return {"rows": rows, "overall_ok": overall}
+    for path, stats in all_cache_stats().items():
+        for key in ("hits", "misses"):
+            rows.append((f"ocr_result_cache_{key}_total", "counter", f"OCR result cache {key}",
+                         {"cache": path}, stats[key]))
+        rows.append(("ocr_result_cache_bytes", "gauge", "OCR result cache size", {"cache": path}, stats["bytes"]))
+    payload_cache = get_payload_cache()
+    if payload_cache is not None:
+        stats = payload_cache.stats()
+        rows += [("payload_cache_hits_total", "counter", "Payload cache hits", None, stats["hits"]),
+                 ("payload_cache_misses_total", "counter", "Payload cache misses", None, stats["misses"]),
+                 ("payload_cache_bytes", "gauge", "Payload cache size", None, stats["bytes"])]
+    governor = dict(get_governor().stats)
+    rows += [("groq_calls_total", "counter", "API calls made through the rate-limit governor", None,
+              governor["calls"]),
+             ("groq_retries_total", "counter", "API calls retried after a retryable error", None,
+              governor["retries"]),
+             ("groq_rate_limited_total", "counter", "API calls answered with HTTP 429", None,
+              governor["rate_limited"]),
+             ("groq_governor_wait_seconds_total", "counter", "Time spent waiting for rate-limit budget", None,
+              governor["waited_seconds"])]
+    flights = ocr_flights.stats()
+    rows.append(("ocr_requests_coalesced_total", "counter", "OCR requests that shared an in-flight call", None,
+                 flights["coalesced"]))
+    hedging = get_hedge_policy().snapshot()
+    for key in ("hedged", "hedge_won", "over_budget"):
+        rows.append((f"groq_hedge_{key}_total", "counter", f"Hedged calls: {key}", None, hedging[key]))
+    return rows
+
+
+metrics.registry.register_collector(_pipeline_metrics)
+
+
+def _encode_timings(payload_stats):
+    """StageTimings for an image, starting with the encode stage from its payload stats"""
+    timings = StageTimings()
+    if payload_stats:
+        timings.record("encode", payload_stats.get("encode_ms", 0.0), payload_stats.get("cpu_ms"))
+    return timings
+
+
+def _timed_request(fn, model, processing_mode, base64_images):
+    """Run one Groq request, recording its latency by model/mode/outcome and the bytes sent"""
+    metrics.GROQ_REQUEST_BYTES.inc(sum(len(b64) for b64 in base64_images), model=model)
+    metrics.GROQ_IMAGES.inc(len(base64_images), model=model, mode=processing_mode)
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        response = fn()
+        outcome = "ok"
+        return response
+    finally:
+        metrics.GROQ_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, mode=processing_mode,
+                                             outcome=outcome)
+
+
+def encode_image_payload(image_path):
+    """Base64 payload for an image (see encode_payload)"""
+    return encode_payload(image_path)[0]
 
 
 class BatchImageProcessor:
-    def __init__(self, base_directory="/Users/mariocruz/FC/O", api_key=None):
+    def __init__(self, base_directory="/Users/mariocruz/FC/O", api_key=None, cache_directory=None):
         if api_key is None:
             api_key = os.environ.get('GROQ_API_KEY')
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
-        self.client = Groq(api_key=api_key)
+        # Shared pooled client (see the client property); retries are owned by the governor
+        self.api_key = api_key
+        self._client = None
+        # Single-flight keys include the API key: a bad or throttled key must not fail other keys' requests
+        self._flight_scope = key_id(api_key)[:16]
+        self.governor = get_governor()
+        self.hedger = get_hedge_policy()
+        # OCR result cache; process_directory falls back to one under its output directory
+        self.result_cache = get_result_cache(cache_directory) if cache_directory else None
         self.base_directory = os.path.abspath(base_directory)
-        # Pre-compile regex patterns for performance
-        self._field_pattern_cache = {}
-        self._label_pattern_cache = {}
         self._filename_clean_pattern = re.compile(r'[^a-zA-Z0-9 -]')
     
 
     
     def image_to_base64(self, image_path):
         """Convert image to base64 string with compression for API limits"""
-        from PIL import Image
-        import io
-        
-        try:
-            # Always compress images for API compatibility
-            with Image.open(image_path) as img:
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = (1024, 1024)
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Compress to JPEG
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=75, optimize=True)
-                return base64.b64encode(buffer.getvalue()).decode('utf-8')
-                
-        except Exception as e:
-            # Fallback to original method if PIL fails
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
+        base64_image, payload_stats = encode_payload(image_path)
+        observe_payload(payload_stats)
+        return base64_image
 
     # -----------------------------
-    # Parsing helpers for model output
+    # Parsing model output (see response_parser)
     # -----------------------------
-    def _get_field(self, text: str, key: str, default: str = "Unknown") -> str:
-        """
-        Extracts single-line fields like:
-        KEY: value
-        Returns 'default' if not found.
-        """
-        # anchor on line starts to avoid grabbing similar words elsewhere
-        m = re.search(rf"(?mi)^\s*{re.escape(key)}\s*:\s*(.*)$", text)
-        if m:
-            return m.group(1).strip() or default
-        return default
-
-    def _block_after_label(self, text: str, label: str, stop_labels):
-        """
-        Extract the block of text after a label line (exact match), until the next label in stop_labels.
-        """
-        # Use cached patterns for performance
-        cache_key = (label, tuple(stop_labels) if stop_labels else ())
-        if cache_key not in self._label_pattern_cache:
-            self._label_pattern_cache[cache_key] = {
-                'start': re.compile(rf"(?mi)^\s*{re.escape(label)}\s*:\s*$"),
-                'inline': re.compile(rf"(?mi)^\s*{re.escape(label)}\s*:\s*(.+)$"),
-                'stop': re.compile(rf"(?mi)^\s*({'|'.join(re.escape(lab) for lab in stop_labels)})\s*:") if stop_labels else None
-            }
-        
-        patterns = self._label_pattern_cache[cache_key]
-        
-        start = patterns['start'].search(text)
-        if not start:
-            # Also try "LABEL:" followed directly by content on same line
-            m_inline = patterns['inline'].search(text)
-            return (m_inline.group(1).strip(),) if m_inline else ("",)
-        start_idx = start.end()
-        # Find next stop label efficiently with cached regex
-        next_stop = len(text)
-        if patterns['stop']:
-            m = patterns['stop'].search(text[start_idx:])
-            if m:
-                next_stop = start_idx + m.start()
-        block = text[start_idx:next_stop].strip()
-        return (block,)
-
     def parse_zip_ode_response(self, content: str) -> dict:
         """
         Parses the structured response produced by processing_mode='zip_ode_explain'.
         """
-        # Core single-line fields
-        student_name = self._get_field(content, "STUDENT_NAME")
-        school_name  = self._get_field(content, "SCHOOL_NAME")
-        zip_code     = self._get_field(content, "ZIP_CODE")
-        poem_title   = self._get_field(content, "POEM_TITLE", default="")
-        poem_theme   = self._get_field(content, "POEM_THEME", default="")
-        poem_lang    = self._get_field(content, "POEM_LANGUAGE", default="")
-
-        # Blocks
-        transcription = self._block_after_label(
-            content, "TRANSCRIPTION",
-            stop_labels=["STUDENT_NAME", "SCHOOL_NAME", "ZIP_CODE", "POEM", "POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "Confidence"]
-        )[0]
-
-        poem_block = self._block_after_label(
-            content, "POEM",
-            stop_labels=["POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "Confidence"]
-        )[0]
-        poem_lines = [ln.rstrip() for ln in poem_block.splitlines() if ln.strip() != ""]
-
-        # Local validation (optional)
-        validation_rows = []
-        if zip_code and zip_code.isdigit():
-            validation_result = validate_poem_lines(poem_lines, zip_code)
-            validation_rows = validation_result["rows"]
-            overall_ok = str(validation_result["overall_ok"])
-        else:
-            overall_ok = "Unknown"
-
-        return {
-            "student_name": student_name,
-            "school_name": school_name,
-            "zip_code": zip_code,
-            "poem_title": poem_title,
-            "poem_theme": poem_theme,
-            "poem_language": poem_lang,
-            "transcription": transcription,
-            "poem_lines": poem_lines,
-            "validation_rows": validation_rows,
-            "overall_ok": overall_ok
-        }
+        return tokenize(content, structured=True).to_zip_ode_dict()
 
-    # -----------------------------
-    # Legacy extractor (kept for compatibility)
-    # -----------------------------
     def extract_student_info_legacy(self, text):
         """Legacy: Extract student name, school, poem title, theme, and language from older outputs"""
-        lines = text.split('\n')
-        info = StudentInfo()
-        
-        # Single pass through lines for efficiency
-        for i, line in enumerate(lines):
-            line = line.strip()
-            
-            # Look for student name and school in first few lines
-            if i < 5:
-                if 'School:' in line or 'school' in line.lower():
-                    info.school_name = line.split(':')[-1].strip() if ':' in line else line
-                    info.school_name = re.sub(r'(?i)\bschool\b', '', info.school_name).strip()
-                elif line and not line.startswith('Grade'):
-                    if 'Name:' in line:
-                        info.student_name = line.split('Name:')[-1].strip()
-                    elif not info.student_name and len(line.split()) <= 4:  # Likely a name
-                        info.student_name = line
-            
-            # Extract poem metadata from any line
-            if line.startswith('POEM_TITLE:'):
-                info.poem_title = line.replace('POEM_TITLE:', '').strip()
-            elif line.startswith('POEM_THEME:'):
-                info.poem_theme = line.replace('POEM_THEME:', '').strip()
-            elif line.startswith('POEM_LANGUAGE:'):
-                info.poem_language = line.replace('POEM_LANGUAGE:', '').strip()
-        
-        return info
+        return tokenize(text).student_info()
 
     def create_filename(self, student_name, school_name, poem_title, poem_theme, fallback_name, zip_code=None):
         """Create meaningful filename from student info"""
@@ -225,222 +218,628 @@ class BatchImageProcessor:
     # -----------------------------
     # Core API call
     # -----------------------------
-    def convert_image_to_text(self, image_path, model="meta-llama/llama-4-scout-17b-16e-instruct", processing_mode="zip_ode_explain"):
-        """Convert single image to text using Groq API"""
+    @property
+    def client(self):
+        """Shared Groq client for this key, fetched per use so the registry sees it as active"""
+        return self._client if self._client is not None else get_client(self.api_key)
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _flight_key(self, cache_key):
+        """Single-flight key: the OCR cache key scoped to this processor's API key"""
+        return f"{cache_key}:{self._flight_scope}"
+
+    def convert_image_to_text(self, image_path, model=DEFAULT_MODEL, processing_mode="zip_ode_explain"):
+        """Convert single image to text using Groq API, returning failures as an 'Error processing' string"""
         try:
-            base64_image = self.image_to_base64(image_path)
-            
-            # Prompts
-            if processing_mode == "poem":
-                prompt_text = f"Transcribe everything in this image including student name, school name at the top, "\
-                             f"and the complete poem below. Preserve exact formatting, line breaks, and punctuation. "\
-                             f"Use [?] for unclear words. At the end, add exactly these 4 lines with no additional text:\n"\
-                             f"POEM_TITLE: [actual title]\n"\
-                             f"POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"\
-                             f"POEM_LANGUAGE: [language name]\n"\
-                             f"Confidence: X/10"
-            elif processing_mode == "freeform":
-                prompt_text = f"Transcribe all text in this image exactly as it appears. Preserve formatting, line breaks, and punctuation. "\
-                             f"Use [?] for unclear words. At the end, add exactly these 4 lines with no additional text:\n"\
-                             f"DOCUMENT_TITLE: [best guess at title or 'Unknown']\n"\
-                             f"DOCUMENT_TYPE: [worksheet, form, letter, notes, or other]\n"\
-                             f"LANGUAGE: [language name]\n"\
-                             f"Confidence: X/10"
-            elif processing_mode == "postcard_poem":
-                prompt_text = (
-                    "Transcribe this postcard poem including any student name, school name, and the complete poem. "
-                    "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
-                    "At the end, add exactly these lines:\n"
-                    "POEM_TITLE: [actual title or 'Postcard Poem']\n"
-                    "POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"
-                    "POEM_LANGUAGE: [language name]\n"
-                    "POSTCARD_TYPE: [greeting, travel, art, or other]\n"
-                    "Confidence: X/10"
-                )
-            elif processing_mode == "worksheet_poem":
-                prompt_text = (
-                    "Transcribe this worksheet including student name, any instructions, and the poem content. "
-                    "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
-                    "At the end, add exactly these lines:\n"
-                    "POEM_TITLE: [actual title or worksheet title]\n"
-                    "POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"
-                    "POEM_LANGUAGE: [language name]\n"
-                    "WORKSHEET_TYPE: [creative writing, fill-in-blank, template, or other]\n"
-                    "Confidence: X/10"
-                )
-            elif processing_mode == "survey_form":
-                prompt_text = (
-                    "Transcribe this survey form including all questions, answers, and participant information. "
-                    "Look for checkboxes (☐ ☑ ✓ ✗ X) and circles around answers. "
-                    "Mark checked boxes as [✓] and unchecked as [☐]. Mark circled answers as (CIRCLED). "
-                    "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
-                    "At the end, add exactly these lines:\n"
-                    "FORM_TITLE: [survey title or 'Survey Form']\n"
-                    "FORM_TYPE: [feedback, evaluation, questionnaire, or other]\n"
-                    "LANGUAGE: [language name]\n"
-                    "PARTICIPANT_NAME: [if visible or 'Unknown']\n"
-                    "Confidence: X/10"
-                )
-            elif processing_mode == "custom_poem":
-                # Load custom settings
-                try:
-                    with open(os.path.join(os.path.dirname(__file__), 'custom_poem_settings.json'), 'r') as f:
-                        settings = json.load(f)['custom_poem']
-                    document_list = ', '.join(settings['document_contains'])
-                    prompt_text = settings['prompt_template'].format(
-                        document_contains=document_list,
-                        structure=settings['structure']
-                    )
-                except (FileNotFoundError, KeyError, json.JSONDecodeError):
-                    prompt_text = (
-                        "Transcribe everything in this image including student name, school name, and poem text. "
-                        "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
-                        "At the end, add: POEM_TITLE: [title]\nPOEM_THEME: [theme]\nPOEM_LANGUAGE: [language]\nConfidence: X/10"
-                    )
-            elif processing_mode == "zip_ode_explain":
-                prompt_text = (
-                    "You are helping with O, Miami's 'Zip Ode' poems.\n\n"
-                    "Task:\n"
-                    "1) Transcribe all visible text exactly (preserve line breaks, punctuation; use [?] for unclear).\n"
-                    "2) Extract these fields when possible:\n"
-                    "   - STUDENT_NAME: (if present at top)\n"
-                    "   - SCHOOL_NAME: (if present at top)\n"
-                    "   - ZIP_CODE: (5 digits; if multiple appear, choose the one associated with the poem)\n"
-                    "3) Identify the poem body (exclude headings/names).\n"
-                    "4) Output a compact report exactly in the schema below (no extra commentary).\n\n"
-                    "Schema (print exactly these keys, one per line, then the poem):\n"
-                    "TRANSCRIPTION:\n"
-                    "<full raw transcription here>\n\n"
-                    "STUDENT_NAME: <string or Unknown>\n"
-                    "SCHOOL_NAME: <string or Unknown>\n"
-                    "ZIP_CODE: <##### or Unknown>\n\n"
-                    "POEM:\n"
-                    "<only the poem lines here, one per line, in order>\n\n"
-                    "POEM_TITLE: <best short title or Unknown>\n"
-                    "POEM_THEME: <one word: family, nature, friendship, school, emotions, seasons, miami, or sun>\n"
-                    "POEM_LANGUAGE: <language name>\n"
-                    "Confidence: <X/10>"
-                )
-            else:
-                raise ValueError(f"Unknown processing_mode: {processing_mode}")
-            
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt_text},
-                            {"type": "image_url",
-                             "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                        ]
-                    }
-                ],
-                model=model,
-                temperature=0.1,
-                max_tokens=2000,
-                timeout=30
-            )
-            
-            return chat_completion.choices[0].message.content
-            
+            return self.request_transcription(image_path, model, processing_mode)
         except Exception as e:
             return f"Error processing {image_path}: {str(e)}"
 
-    # -----------------------------
-    # Directory processing
-    # -----------------------------
-    def process_directory(self, directory_path, output_directory=None, output_file="batch_results.json", processing_mode="zip_ode_explain"):
-        if output_directory is None:
-            output_directory = directory_path
-        """Process all images in a directory"""
-        supported_formats = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.heic', '.heif')
-        results = []
+    def request_transcription(self, image_path, model=DEFAULT_MODEL, processing_mode="zip_ode_explain", base64_image=None,
+                              details=None):
+        """Convert single image to text using Groq API; raises once the governor gives up retrying.
+
+        base64_image may be passed in when the payload was already encoded
+        (e.g. by the batch preprocessing pool). If a details dict is given,
+        details["model"] is set to the model that produced the text (a hedge
+        may have answered on the fallback model).
+        """
+        if base64_image is None:
+            base64_image = self.image_to_base64(image_path)
         
-        image_files = [f for f in os.listdir(directory_path) 
-                      if f.lower().endswith(supported_formats)]
+        # Prompts come precompiled from the mode registry (raises ValueError for unknown modes)
+        prompt_text = get_mode(processing_mode).prompt
+        
+        request_key = OCRResultCache.make_key(base64_image, model, processing_mode, prompt_text)
+        # Identical concurrent requests (double-clicks, two reviewers, prefetch + Convert) share one call
+        text, used_model = ocr_flights.do(
+            self._flight_key(request_key),
+            lambda: self._transcribe(request_key, base64_image, model, processing_mode, prompt_text))
+        if details is not None:
+            details["model"] = used_model
+        return text
+
+    def _transcribe(self, cache_key, base64_image, model, processing_mode, prompt_text):
+        """(text, model that produced it): the cached result for the request key, or one governed API call"""
+        cache = self.result_cache
+        if cache is not None:
+            cached_text = cache.get(cache_key)
+            if cached_text is not None:
+                return cached_text, model
+
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt_text},
+                    {"type": "image_url",
+                     "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                ]
+            }
+        ]
+        def call(model_name, track):
+            # track wraps only the HTTP request, so hedge timing ignores governor waits and backoff
+            return _timed_request(lambda: self.governor.call(
+                lambda: track(lambda: self.client.chat.completions.with_raw_response.create(
+                    messages=messages,
+                    model=model_name,
+                    temperature=0.1,
+                    max_tokens=MAX_COMPLETION_TOKENS,
+                    timeout=30
+                )),
+                estimated_tokens=estimate_request_tokens(prompt_text),
+            ), model_name, processing_mode, [base64_image])
         
-        logging.info(f"Found {len(image_files)} image files to process...")
+        # A request running past the tracked latency percentile may be hedged (optionally on a fallback model)
+        hedge_model = self.hedger.fallback_model or model
+        chat_completion, winner = self.hedger.run(lambda track: call(model, track),
+                                                  lambda track: call(hedge_model, track))
+        used_model = hedge_model if winner == "hedge" else model
+        if used_model != model:
+            logging.info(f"Hedge request on {used_model} answered first (requested {model})")
         
-        for i, filename in enumerate(image_files, 1):
-            image_path = os.path.join(directory_path, filename)
-            logging.info(f"Processing {i}/{len(image_files)}: {filename}")
-            
-            converted_text = self.convert_image_to_text(
-                image_path,
-                "meta-llama/llama-4-scout-17b-16e-instruct",
-                processing_mode=processing_mode
-            )
-
-            # Try new structured parser first
-            parsed = self.parse_zip_ode_response(converted_text) if processing_mode == "zip_ode_explain" else None
-
-            if parsed:
-                student_name  = parsed["student_name"]
-                school_name   = parsed["school_name"]
-                poem_title    = parsed["poem_title"]
-                poem_theme    = parsed["poem_theme"]
-                poem_language = parsed["poem_language"]
-                zip_code      = parsed["zip_code"]
-                meaningful_name = self.create_filename(
-                    student_name, school_name, poem_title, poem_theme,
-                    fallback_name=os.path.splitext(filename)[0],
-                    zip_code=zip_code if zip_code and zip_code.isdigit() else None
-                )
+        content = chat_completion.choices[0].message.content
+        if cache is not None and content:
+            # Stored under the model that produced the text, never under the requested one
+            if used_model != model:
+                cache_key = OCRResultCache.make_key(base64_image, used_model, processing_mode, prompt_text)
+            cache.put(cache_key, used_model, processing_mode, content)
+        return content, used_model
+
+    def request_pack_transcription(self, model, processing_mode, base64_images, details=None):
+        """Transcribe several images with one API request; returns one text per image.
+
+        Images already in the OCR result cache are not sent. Raises
+        PackSplitError when the response can't be split into exactly one
+        section per image. details["models"] is set to the model behind each
+        text when a details dict is given (see request_transcription).
+        """
+        prompt_text = get_mode(processing_mode).prompt
+        cache = self.result_cache
+        keys = [OCRResultCache.make_key(b64, model, processing_mode, prompt_text) for b64 in base64_images]
+        texts = [cache.get(key) if cache is not None else None for key in keys]
+        missing = [n for n, text in enumerate(texts) if text is None]
+        models = [model] * len(base64_images)
+        if len(missing) == 1:
+            n = missing[0]
+            texts[n], models[n] = ocr_flights.do(self._flight_key(keys[n]),
+                                      lambda: self._transcribe(keys[n], base64_images[n], model,
+                                                               processing_mode, prompt_text))
+        elif missing:
+            messages = build_pack_messages(prompt_text, [base64_images[n] for n in missing])
+            max_tokens = min(MAX_COMPLETION_TOKENS * len(missing), PACK_MAX_COMPLETION_TOKENS)
+            chat_completion = _timed_request(lambda: self.governor.call(
+                lambda: self.client.chat.completions.with_raw_response.create(
+                    messages=messages,
+                    model=model,
+                    temperature=0.1,
+                    max_tokens=max_tokens,
+                    timeout=30 * len(missing)
+                ),
+                estimated_tokens=estimate_request_tokens(prompt_text, images=len(missing), max_tokens=max_tokens),
+            ), model, processing_mode, [base64_images[n] for n in missing])
+            sections = split_pack_response(chat_completion.choices[0].message.content, len(missing))
+            for n, text in zip(missing, sections):
+                texts[n] = text
+                if cache is not None:
+                    cache.put(keys[n], model, processing_mode, text)
+        if details is not None:
+            details["models"] = models
+        return texts
+
+    # -----------------------------
+    # Directory processing
+    # -----------------------------
+    def process_image(self, image_path, output_directory, processing_mode="zip_ode_explain", model=DEFAULT_MODEL,
+                      payload=None, observe=True):
+        """Convert a single image, save its text + JSON sidecar and return the result dict.
+
+        payload is an optional Future from the preprocessing pool resolving to encode_payload(image_path).
+        observe=False skips recording the payload in the metrics (the caller already did).
+        """
+        payload_stats = None
+        timings = StageTimings()
+        try:
+            base64_image, payload_stats = payload.result() if payload is not None else encode_payload(image_path)
+            if observe:
+                observe_payload(payload_stats)
+            timings = _encode_timings(payload_stats)
+            details = {}
+            with timings.stage("transcribe"):
+                converted_text = self.request_transcription(image_path, model, processing_mode=processing_mode,
+                                                            base64_image=base64_image, details=details)
+        except Exception as e:
+            return self._failure(image_path, e, payload_stats, timings)
+        return self._save_result(image_path, output_directory, processing_mode, converted_text, payload_stats,
+                                 timings=timings, model=details.get("model", model))
+
+    def process_pack(self, image_paths, output_directory, processing_mode="zip_ode_explain", model=DEFAULT_MODEL,
+                     payloads=None):
+        """Convert several images with one packed API request and return their result dicts in order.
+
+        If the packed response can't be split per image (or the model rejects
+        multi-image requests), each image is retried on its own request.
+        payloads is an optional list of preprocessing Futures, as for process_image.
+        """
+        results = [None] * len(image_paths)
+        encoded = []        # (position, base64 payload, payload stats)
+        for n, image_path in enumerate(image_paths):
+            payload = payloads[n] if payloads else None
+            try:
+                base64_image, payload_stats = payload.result() if payload is not None else encode_payload(image_path)
+            except Exception as e:
+                results[n] = self._failure(image_path, e, None)
+                continue
+            observe_payload(payload_stats)
+            encoded.append((n, base64_image, payload_stats))
+
+        texts = None
+        pack_timings = StageTimings()
+        details = {}
+        if len(encoded) > 1:
+            try:
+                with pack_timings.stage("transcribe"):
+                    texts = self.request_pack_transcription(model, processing_mode, [b64 for _, b64, _ in encoded],
+                                                            details=details)
+            except (PackSplitError, BadRequestError) as e:
+                logging.warning(f"  Packed request for {len(encoded)} images failed ({e}); "
+                                f"falling back to one image per request")
+            except Exception as e:
+                for n, _, payload_stats in encoded:
+                    timings = _encode_timings(payload_stats)
+                    timings.stages.update(pack_timings.stages)
+                    results[n] = self._failure(image_paths[n], e, payload_stats, timings)
+                return results
+
+        for k, (n, base64_image, payload_stats) in enumerate(encoded):
+            if texts is not None:
+                # Every image in the pack is charged the whole (shared) request
+                timings = _encode_timings(payload_stats)
+                timings.stages.update(pack_timings.stages)
+                used_model = details["models"][k] if "models" in details else model
+                results[n] = self._save_result(image_paths[n], output_directory, processing_mode, texts[k],
+                                               payload_stats, packed=len(encoded), timings=timings, model=used_model)
             else:
-                # Fallback to legacy extractor for other modes
-                info = self.extract_student_info_legacy(converted_text)
-                student_name, school_name, poem_title, poem_theme, poem_language = info.student_name, info.school_name, info.poem_title, info.poem_theme, info.poem_language
-                zip_code = ""
-                meaningful_name = self.create_filename(
-                    student_name, school_name, poem_title, poem_theme,
-                    fallback_name=os.path.splitext(filename)[0],
-                    zip_code=None
-                )
-
-            # Prepare result object
-            result = {
-                "filename": filename,
-                "image_path": image_path,
-                "converted_text": converted_text,
-                "student_name": student_name,
-                "school_name": school_name,
-                "zip_code": zip_code,
-                "poem_title": poem_title,
-                "poem_theme": poem_theme,
-                "poem_language": poem_language,
-                "parsed": parsed if parsed else {},
-                "saved_as": f"{meaningful_name}.txt",
-                "processed_at": datetime.now(timezone.utc).isoformat()
-            }
-            results.append(result)
-            
+                results[n] = self.process_image(image_paths[n], output_directory, processing_mode, model,
+                                                payload=_resolved((base64_image, payload_stats)), observe=False)
+        return results
+
+    def _failure(self, image_path, error, payload_stats, timings=None):
+        """Result dict for an image that could not be converted (nothing is written to disk)"""
+        filename = os.path.basename(image_path)
+        # Never save an API failure as if it were a transcription
+        logging.error(f"  Failed {filename}: {error}")
+        metrics.ERRORS.inc(stage="payload" if payload_stats is None else "transcribe", error=type(error).__name__)
+        return {
+            "filename": filename,
+            "image_path": image_path,
+            "error": f"{type(error).__name__}: {error}",
+            "payload": payload_stats,
+            "timings": timings.to_dict() if timings else {},
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    def _save_result(self, image_path, output_directory, processing_mode, converted_text, payload_stats,
+                     packed=None, timings=None, model=None):
+        """Parse a transcription, write its text + JSON sidecar and return the result dict.
+
+        timings (StageTimings) gains the parse and write stages; the sidecar is
+        written before the write stage ends, so only the returned dict has it.
+        model is the model that produced the text, recorded in the result.
+        """
+        filename = os.path.basename(image_path)
+        if timings is None:
+            timings = StageTimings()
+
+        # One pass over the response, with the parser the mode declares
+        with timings.stage("parse", metrics.PARSE_SECONDS, mode=processing_mode):
+            record = parse_response(converted_text, processing_mode)
+        parsed = record.to_zip_ode_dict() if record.structured else None
+        student_name, school_name = record.student_name, record.school_name
+        poem_title, poem_theme, poem_language = record.poem_title, record.poem_theme, record.poem_language
+        zip_code = record.zip_code
+        meaningful_name = self.create_filename(
+            student_name, school_name, poem_title, poem_theme,
+            fallback_name=os.path.splitext(filename)[0],
+            zip_code=zip_code if zip_code and zip_code.isdigit() else None
+        )
+
+        # Prepare result object
+        result = {
+            "filename": filename,
+            "image_path": image_path,
+            "converted_text": converted_text,
+            "student_name": student_name,
+            "school_name": school_name,
+            "zip_code": zip_code,
+            "poem_title": poem_title,
+            "poem_theme": poem_theme,
+            "poem_language": poem_language,
+            "parsed": parsed if parsed else {},
+            "fields": record.fields,
+            "payload": payload_stats,
+            "model": model,
+            "timings": timings.to_dict(),
+            "saved_as": f"{meaningful_name}.txt",
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        }
+        if packed:
+            result["packed"] = packed
+
+        with timings.stage("write", metrics.WRITE_SECONDS):
             # Save individual text file with meaningful name
             text_filename = f"{meaningful_name}.txt"
             text_path = os.path.join(output_directory, text_filename)
             with open(text_path, 'w', encoding='utf-8') as f:
                 f.write(converted_text)
-            
+
             # Also save a JSON sidecar with parsed fields and validation (handy for QA)
             json_sidecar = f"{meaningful_name}.json"
             json_path = os.path.join(output_directory, json_sidecar)
             with open(json_path, 'w', encoding='utf-8') as jf:
                 json.dump(result, jf, indent=2, ensure_ascii=False)
-    
-                logging.info(f"  Saved as: {text_filename} (+ {json_sidecar})")
-            
-        # Save batch results as JSON
+
+        logging.info(f"  Saved as: {text_filename} (+ {json_sidecar})")
+        return result
+
+    def list_images(self, directory_path):
+        """Supported image filenames in a directory, sorted for a deterministic processing order"""
+        supported_formats = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.heic', '.heif')
+        return sorted(f for f in os.listdir(directory_path)
+                      if f.lower().endswith(supported_formats))
+
+    def iter_directory(self, directory_path, output_directory=None, output_file="batch_results.json",
+                       processing_mode="zip_ode_explain", max_workers=None, resume=False,
+                       preprocess_workers=None, cancel_event=None, progress_callback=None, pack_size=None,
+                       profiler=None):
+        """Process a directory and yield each result dict as it is produced.
+
+        Results are yielded in sorted input order. With max_workers > 1 images
+        are converted concurrently on a thread pool (the work is dominated by
+        the Groq round trip) while only a bounded window of results is held.
+        Sidecars are written as each image completes, and every finished image
+        is appended to a journal next to output_file. With resume=True images
+        already recorded there as successful are skipped (and not yielded).
+
+        With preprocess_workers > 0 image decoding/resizing/encoding runs in a
+        process pool a bounded number of images ahead of the network stage,
+        so payloads are ready by the time a Groq slot frees up.
+
+        Setting cancel_event (a threading.Event) stops new images from being
+        started; images already in flight finish and are journaled.
+        progress_callback(done, total, result) is called once with result=None
+        when the run starts and then after each image completes (from worker
+        threads, in completion order); total counts the images to process.
+
+        With pack_size > 1 (at most MAX_PACK_SIZE) consecutive images are sent
+        together in one API request (see process_pack); each worker handles one
+        pack at a time.
+
+        profiler (a profiling.RunProfiler) runs the work units it samples under cProfile.
+        """
+        if output_directory is None:
+            output_directory = directory_path
+        if max_workers is None:
+            max_workers = default_worker_count()
+        max_workers = max(1, int(max_workers))
+        if self.result_cache is None:
+            self.result_cache = get_result_cache(output_directory)
+
+        image_files = self.list_images(directory_path)
+        total = len(image_files)
+
+        journal = BatchJournal.for_output(output_directory, output_file)
+        if resume:
+            done = journal.completed()
+        else:
+            journal.reset()
+            done = set()
+        todo = [(i, f) for i, f in enumerate(image_files, 1) if f not in done]
+
+        if done:
+            logging.info(f"Resuming: {total - len(todo)} of {total} images already completed")
+        logging.info(f"Found {len(todo)} image files to process with {max_workers} worker(s)...")
+
+        if preprocess_workers is None:
+            preprocess_workers = default_preprocess_worker_count()
+        if pack_size is None:
+            pack_size = default_pack_size()
+        pack_size = max(1, min(int(pack_size), MAX_PACK_SIZE))
+        if pack_size > 1:
+            logging.info(f"Packing up to {pack_size} images per request")
+
+        progress_lock = threading.Lock()
+        progress = {"done": 0}
+        if progress_callback:
+            progress_callback(0, len(todo), None)
+
+        def finish(result):
+            journal.append(result)
+            if progress_callback:
+                with progress_lock:
+                    progress["done"] += 1
+                    done_count = progress["done"]
+                progress_callback(done_count, len(todo), result)
+            return result
+
+        def process_unit(unit):
+            """Results for one unit of work: a single image, or a pack of them"""
+            if profiler is not None and profiler.wants(unit[0][0]):
+                return profiler.run(lambda: convert_unit(unit))
+            return convert_unit(unit)
+
+        def convert_unit(unit):
+            if len(unit) == 1:
+                i, filename, payload = unit[0]
+                logging.info(f"Processing {i}/{total}: {filename}")
+                return [finish(self.process_image(os.path.join(directory_path, filename), output_directory,
+                                                  processing_mode, payload=payload))]
+            logging.info(f"Processing {unit[0][0]}-{unit[-1][0]}/{total} as one pack: "
+                         f"{', '.join(filename for _, filename, _ in unit)}")
+            results = self.process_pack([os.path.join(directory_path, filename) for _, filename, _ in unit],
+                                        output_directory, processing_mode,
+                                        payloads=[payload for _, _, payload in unit])
+            return [finish(result) for result in results]
+
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        with ExitStack() as stack:
+            if preprocess_workers > 0:
+                pool = stack.enter_context(ProcessPoolExecutor(
+                    max_workers=preprocess_workers, mp_context=multiprocessing.get_context("spawn")))
+                work = _prefetch_payloads(pool, directory_path, todo, lookahead=preprocess_workers + max_workers)
+            else:
+                work = ((i, filename, None) for i, filename in todo)
+            units = _chunked(work, pack_size)
+
+            if max_workers == 1:
+                for unit in units:
+                    if cancelled():
+                        logging.info("Batch cancelled, stopping before the remaining images")
+                        return
+                    yield from process_unit(unit)
+                return
+
+            # Keep a bounded window of in-flight futures and yield them in
+            # submission order so the output order is deterministic.
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr"))
+            pending = deque()
+            try:
+                for unit in units:
+                    if cancelled():
+                        logging.info("Batch cancelled, finishing images already in flight")
+                        break
+                    pending.append(executor.submit(process_unit, unit))
+                    if len(pending) >= max_workers * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    future = pending.popleft()
+                    if cancelled() and future.cancel():
+                        continue
+                    yield from future.result()
+            finally:
+                # Consumer stopped early: don't start images nobody will read
+                for future in pending:
+                    future.cancel()
+
+    def process_directory(self, directory_path, output_directory=None, output_file="batch_results.json",
+                          processing_mode="zip_ode_explain", max_workers=None, resume=False,
+                          output_format="json", preprocess_workers=None, cancel_event=None,
+                          progress_callback=None, pack_size=None, profile_path=None, profile_every=1):
+        """Process all images in a directory and write the run manifest.
+
+        output_format="json" writes output_file as one JSON array and returns
+        the full result list. output_format="jsonl" writes JSON Lines (a .json
+        output_file becomes .jsonl), flushing one record per image as it is
+        produced, and returns only slim per-image summaries so memory stays
+        flat for large batches. Either way the manifest is rebuilt from the
+        journal, so resumed runs include images finished before the restart.
+        See iter_directory for cancel_event, progress_callback and pack_size.
+
+        Each result carries per-stage wall/CPU timings; a summary of this run's
+        stages and payload sizes is logged and saved as <manifest>.summary.json.
+        With profile_path every profile_every-th image runs under cProfile and
+        the merged stats are dumped there (read with pstats).
+        """
+        if output_format not in ("json", "jsonl"):
+            raise ValueError(f"Unknown output_format: {output_format}")
+        if output_directory is None:
+            output_directory = directory_path
+        if output_format == "jsonl" and output_file.endswith(".json"):
+            output_file += "l"
+
         output_path = os.path.join(output_directory, output_file)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-            
+        metrics_start = metrics.registry.snapshot()
+        journal = BatchJournal.for_output(output_directory, output_file)
+        profiler = RunProfiler(profile_every) if profile_path else None
+        summary = RunSummary()
+        results = (summary.add(result) for result in self.iter_directory(
+            directory_path, output_directory, output_file, processing_mode, max_workers, resume,
+            preprocess_workers, cancel_event, progress_callback, pack_size, profiler))
+
+        if output_format == "jsonl":
+            summaries = []
+            with open(output_path, 'w', encoding='utf-8') as f:
+                if resume:
+                    # Carry over images finished before the restart
+                    offsets = journal.latest_offsets()
+                    earlier = [name for name in self.list_images(directory_path)
+                               if name in offsets and not offsets[name][1]]
+                    for record in journal.iter_latest(earlier, offsets):
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        summaries.append(_summarize(record))
+                    f.flush()
+                for result in results:
+                    f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    f.flush()
+                    summaries.append(_summarize(result))
+            results = summaries
+        else:
+            for _ in results:
+                pass
+            # Rebuild the run manifest from the journal in input order
+            results = list(journal.iter_latest(self.list_images(directory_path)))
+
+            # Save batch results as JSON (atomically, so a crash never leaves half a file)
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, output_path)
+
         logging.info(f"\nBatch processing completed. Results saved to {output_path}")
-        logging.info(f"Created {len(results)} text files with meaningful names")
+        if self.result_cache is not None:
+            logging.info(f"OCR cache: {self.result_cache.stats()}")
+        failed = sum(1 for r in results if "error" in r)
+        logging.info(f"Created {len(results) - failed} text files with meaningful names ({failed} failed)")
+        self.dump_metrics(output_path, since=metrics_start)
+        self.save_summary(output_path, summary)
+        if profiler is not None:
+            profiler.dump(profile_path)
         return results
 
+    def save_summary(self, output_path, summary):
+        """Log this run's stage breakdown and write it to <manifest>.summary.json"""
+        summary_path = f"{os.path.splitext(output_path)[0]}.summary.json"
+        data = summary.log()
+        try:
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not write run summary to {summary_path}: {e}")
+        return data
+
+    def dump_metrics(self, output_path, since=None):
+        """Write metrics next to the run manifest (<manifest>.metrics.json).
+
+        With since (a registry snapshot taken at run start) only what changed
+        after it is written; otherwise the process-wide totals. The registry
+        is shared, so other runs in the same process overlapping this one
+        are counted too.
+        """
+        metrics_path = f"{os.path.splitext(output_path)[0]}.metrics.json"
+        snapshot = metrics.registry.snapshot()
+        if since is not None:
+            snapshot = metrics.delta(since, snapshot)
+        try:
+            with open(metrics_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {metrics_path}: {e}")
+            return None
+        logging.info(f"Metrics saved to {metrics_path}")
+        return metrics_path
+
+
+def _chunked(work, size):
+    """Group (i, filename, payload) items into lists of up to `size`"""
+    unit = []
+    for item in work:
+        unit.append(item)
+        if len(unit) >= size:
+            yield unit
+            unit = []
+    if unit:
+        yield unit
+
+
+def _resolved(value):
+    """A Future already holding value (lets an encoded payload be handed to process_image)"""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _prefetch_payloads(pool, directory_path, todo, lookahead):
+    """Yield (i, filename, payload_future), keeping at most `lookahead` encodes queued ahead of the consumer"""
+    queue = deque()
+    for i, filename in todo:
+        queue.append((i, filename, pool.submit(encode_payload, os.path.join(directory_path, filename))))
+        if len(queue) > lookahead:
+            yield queue.popleft()
+    while queue:
+        yield queue.popleft()
+
+
+def _summarize(result):
+    """Slim per-image record returned by process_directory in jsonl mode"""
+    summary = {"filename": result["filename"], "saved_as": result.get("saved_as")}
+    if "error" in result:
+        summary["error"] = result["error"]
+    return summary
+
+
+def default_preprocess_worker_count():
+    """Image preprocessing processes for batch runs, from BATCH_PREPROCESS_WORKERS (default 0 = inline)"""
+    try:
+        return max(0, int(os.environ.get('BATCH_PREPROCESS_WORKERS', '0')))
+    except ValueError:
+        logging.warning("Ignoring invalid BATCH_PREPROCESS_WORKERS value, preprocessing inline")
+        return 0
+
+
+def default_pack_size():
+    """Images per API request for batch runs, from BATCH_PACK_SIZE (default 1 = no packing)"""
+    try:
+        return max(1, min(int(os.environ.get('BATCH_PACK_SIZE', '1')), MAX_PACK_SIZE))
+    except ValueError:
+        logging.warning("Ignoring invalid BATCH_PACK_SIZE value, sending one image per request")
+        return 1
+
+def default_worker_count():
+    """Concurrency for batch runs, from the BATCH_WORKERS environment variable (default 1)"""
+    try:
+        return max(1, int(os.environ.get('BATCH_WORKERS', '1')))
+    except ValueError:
+        logging.warning("Ignoring invalid BATCH_WORKERS value, using 1 worker")
+        return 1
+
 # -----------------------------
 # Main
 # -----------------------------
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch OCR all images in UPLOAD_DIRECTORY")
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="number of images to process concurrently (env: BATCH_WORKERS)")
+    parser.add_argument("--preprocess-workers", type=int, default=default_preprocess_worker_count(),
+                        help="processes that decode/encode images ahead of the API calls "
+                             "(env: BATCH_PREPROCESS_WORKERS, 0 = inline)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip images already completed in the previous run's journal")
+    parser.add_argument("--format", choices=("json", "jsonl"), default="json", dest="output_format",
+                        help="batch results as one JSON array or streamed JSON Lines")
+    parser.add_argument("--pack-size", type=int, default=default_pack_size(),
+                        help=f"images sent together in one API request, up to {MAX_PACK_SIZE} "
+                             "(env: BATCH_PACK_SIZE, 1 = no packing)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run images under cProfile and write the merged pstats dump to PATH")
+    parser.add_argument("--profile-every", type=int, default=1, metavar="N",
+                        help="with --profile, only profile every Nth image (profiled images run one at a time)")
+    args = parser.parse_args(argv)
+
     upload_dir = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
     output_dir = os.environ.get('OUTPUT_DIRECTORY', os.getcwd())
     
@@ -448,7 +847,12 @@ def main():
     base_dir = os.path.dirname(upload_dir) if upload_dir != os.getcwd() else os.getcwd()
     processor = BatchImageProcessor(base_dir)
     # Process all images in the directory with the new mode
-    results = processor.process_directory(upload_dir, output_dir, processing_mode="zip_ode_explain")
+    results = processor.process_directory(upload_dir, output_dir, processing_mode="zip_ode_explain",
+                                          max_workers=args.workers, resume=args.resume,
+                                          output_format=args.output_format,
+                                          preprocess_workers=args.preprocess_workers,
+                                          pack_size=args.pack_size, profile_path=args.profile,
+                                          profile_every=args.profile_every)
     
     logging.info(f"Successfully processed {len(results)} images")
 
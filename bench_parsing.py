@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the per-image parsing and validation hot paths.
+
+Runs each function over a corpus of synthetic model responses (long
+transcriptions, missing labels, multilingual text, every processing mode)
+and reports ops/sec plus allocations per call.
+
+    python bench_parsing.py                         # print results
+    python bench_parsing.py --save bench.json       # record a baseline
+    python bench_parsing.py --compare bench.json    # exit 1 if anything got slower than --tolerance
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')   # BatchImageProcessor needs a key; no request is sent
+
+from batch_processor import BatchImageProcessor, validate_poem_lines, word_count
+from response_parser import parse_response, tokenize
+
+WORDS = {
+    'English': "sun bay palm street wave mango abuela bus night salt light home river song".split(),
+    'Spanish': "sol bahía palma calle ola mango abuela guagua noche sal luz hogar río canción".split(),
+    'Haitian Creole': "solèy bè pye palmis lari vag mango grann bis lannwit sèl limyè lakay rivyè chante".split(),
+    'Portuguese': "sol baía palmeira rua onda manga avó ônibus noite sal luz casa rio canção".split(),
+}
+NAMES = ["Maria Lopez", "Jean-Baptiste Pierre", "Ana Sofía Díaz", "Kevin Nguyen", "Zoë O'Connor"]
+SCHOOLS = ["Coral Way K-8", "Miami Beach Senior High", "École Toussaint Louverture", "Arcola Lake Elementary"]
+THEMES = ["family", "nature", "friendship", "school", "emotions", "seasons", "miami", "sun"]
+ZIP_CODES = ["33133", "33139", "33127", "33054", "33101"]
+
+
+def _line(rng, words, count):
+    return ' '.join(rng.choice(words) for _ in range(count)).capitalize()
+
+
+def generate_response(rng, mode="zip_ode_explain", transcription_lines=8, missing_rate=0.15):
+    """One synthetic model response in the shape the mode's prompt asks for"""
+    language = rng.choice(list(WORDS))
+    words = WORDS[language]
+    zip_code = rng.choice(ZIP_CODES)
+    name, school = rng.choice(NAMES), rng.choice(SCHOOLS)
+    poem = [_line(rng, words, int(d) or 1) for d in zip_code]
+    body = [name, school] + [_line(rng, words, rng.randint(2, 12)) for _ in range(transcription_lines)] + poem
+
+    def field(key, value):
+        return [] if rng.random() < missing_rate else [f"{key}: {value}"]
+
+    if mode == "zip_ode_explain":
+        lines = ["TRANSCRIPTION:"] + body + [""]
+        lines += field("STUDENT_NAME", name) + field("SCHOOL_NAME", school) + field("ZIP_CODE", zip_code)
+        if rng.random() >= missing_rate:
+            lines += ["", "POEM:"] + poem + [""]
+    else:
+        lines = body + [""]
+        if mode == "postcard_poem":
+            lines += field("POSTCARD_TYPE", "travel")
+        elif mode == "survey_form":
+            lines += field("FORM_TITLE", "Feedback") + field("PARTICIPANT_NAME", name)
+    lines += field("POEM_TITLE", _line(rng, words, 3)) + field("POEM_THEME", rng.choice(THEMES))
+    lines += field("POEM_LANGUAGE", language) + [f"Confidence: {rng.randint(5, 10)}/10"]
+    return '\n'.join(lines)
+
+
+def build_corpus(size=200, seed=1234):
+    rng = random.Random(seed)
+    modes = ["zip_ode_explain", "zip_ode_explain", "poem", "postcard_poem", "survey_form"]
+    corpus = []
+    for i in range(size):
+        # Every tenth response is a long (full-page) transcription
+        lines = rng.randint(150, 300) if i % 10 == 0 else rng.randint(4, 30)
+        mode = modes[i % len(modes)]
+        corpus.append((mode, generate_response(rng, mode, transcription_lines=lines)))
+    return corpus
+
+
+def build_cases(corpus):
+    """name -> (function, list of argument tuples) for every hot path"""
+    processor = BatchImageProcessor(api_key=os.environ['GROQ_API_KEY'])
+    zip_records = [tokenize(text, structured=True) for mode, text in corpus if mode == "zip_ode_explain"]
+    records = [parse_response(text, mode) for mode, text in corpus]
+    return {
+        "parse_response": (parse_response, [(text, mode) for mode, text in corpus]),
+        "parse_zip_ode_response": (processor.parse_zip_ode_response,
+                                   [(text,) for mode, text in corpus if mode == "zip_ode_explain"]),
+        "extract_student_info_legacy": (processor.extract_student_info_legacy,
+                                        [(text,) for mode, text in corpus if mode != "zip_ode_explain"]),
+        "validate_poem_lines": (validate_poem_lines, [(r.poem_lines, r.zip_code) for r in zip_records]),
+        "word_count": (word_count, [(line,) for r in zip_records for line in r.poem_lines]),
+        "create_filename": (processor.create_filename,
+                            [(r.student_name, r.school_name, r.poem_title, r.poem_theme, "fallback", r.zip_code)
+                             for r in records]),
+    }
+
+
+def measure(fn, args_list, min_time=1.0, repeats=5):
+    """Best-of-`repeats` ops/sec, plus mean peak bytes allocated per call and blocks retained (tracemalloc)"""
+    for args in args_list:      # warm-up (regex compilation, caches)
+        fn(*args)
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in args_list:
+                fn(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats:
+            break
+        loops *= 2
+
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in args_list:
+                fn(*args)
+        best = min(best, time.perf_counter() - start)
+    ops = loops * len(args_list)
+
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        before = tracemalloc.take_snapshot()
+        for args in args_list:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(*args)
+            peak_total += tracemalloc.get_traced_memory()[1] - base
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    # Net blocks still alive after the run (results kept by the caller are dropped immediately, so ~0 means no leak)
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    return {
+        "ops_per_sec": ops / best,
+        "us_per_op": best / ops * 1e6,
+        "peak_bytes_per_op": peak_total / len(args_list),
+        "retained_blocks": retained,
+    }
+
+
+def run(corpus_size=200, min_time=1.0, only=None):
+    cases = build_cases(build_corpus(corpus_size))
+    results = {}
+    for name, (fn, args_list) in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = measure(fn, args_list, min_time=min_time)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Names whose ops/sec fell more than `tolerance` below the baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous and current["ops_per_sec"] < previous["ops_per_sec"] * (1 - tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def print_table(results, baseline=None):
+    print(f"{'function':<30}{'ops/sec':>14}{'us/op':>10}{'peak B/op':>12}{'vs base':>10}")
+    for name, r in results.items():
+        change = ""
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous:
+            change = f"{(r['ops_per_sec'] / previous['ops_per_sec'] - 1) * 100:+.1f}%"
+        print(f"{name:<30}{r['ops_per_sec']:>14,.0f}{r['us_per_op']:>10.2f}{r['peak_bytes_per_op']:>12,.0f}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the response parsing and validation hot paths")
+    parser.add_argument("--corpus", type=int, default=200, help="number of synthetic responses")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds of timing per function")
+    parser.add_argument("--only", nargs="*", help="benchmark just these functions")
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed ops/sec drop vs the baseline before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.corpus, args.min_time, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"python": platform.python_version(), "corpus": args.corpus,
+                       "created_at": time.time(), "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+
+import httpx
+from groq import Groq
+
+# Model ids containing any of these can handle the vision OCR prompts
+VISION_KEYWORDS = ['vision', 'scout', 'llama-4', 'llama-3.3', 'llama3-70b', 'compound']
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    """Response body that reports when it is closed (the request is then finished)"""
+
+    def __init__(self, stream, done):
+        self._stream = stream
+        self._done = done
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._done()
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTP transport that counts requests in flight, so an evicted client is only closed when unused"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self._active_lock = threading.Lock()
+
+    def _finished(self):
+        with self._active_lock:
+            self.active -= 1
+
+    def handle_request(self, request):
+        with self._active_lock:
+            self.active += 1
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self._finished()
+            raise
+        released = threading.Event()
+
+        def done():
+            if not released.is_set():
+                released.set()
+                self._finished()
+
+        response.stream = _TrackedStream(response.stream, done)
+        return response
+
+
+def key_id(api_key):
+    """Registry key: never keep raw API keys as dict keys or in logs"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class GroqClientRegistry:
+    """Process-wide Groq clients, one per API key, with pooled keep-alive connections.
+
+    Every BatchImageProcessor built for the same key reuses the same client,
+    so requests share TLS sessions and connection pools. Pooled connections
+    idle for ``keepalive_seconds`` are closed by httpx. Registry entries not
+    handed out for ``idle_seconds`` are dropped and their connection pools
+    closed - right away if no request is in flight, otherwise on a later
+    call once those requests finish. Callers should therefore fetch the
+    client per request rather than keep one. The vision-model list is cached
+    per key for ``models_ttl`` seconds.
+    """
+
+    def __init__(self, max_connections=20, keepalive_seconds=60.0, idle_seconds=900.0, models_ttl=300.0):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections,
+                                   keepalive_expiry=keepalive_seconds)
+        self.idle_seconds = idle_seconds
+        self.models_ttl = models_ttl
+        self._clients = {}      # key id -> [client, last_used, transport]
+        self._retired = []      # (client, transport) evicted while a request was in flight
+        self._models = {}       # key id -> (fetched_at, model ids)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, api_key):
+        key = key_id(api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self.reused += 1
+                return entry[0]
+            # Retries are owned by the shared rate-limit governor
+            transport = _CountingTransport(limits=self.limits)
+            client = Groq(api_key=api_key, max_retries=0, http_client=httpx.Client(transport=transport))
+            self._clients[key] = [client, now, transport]
+            self.created += 1
+            return client
+
+    def _evict_idle(self, now):
+        for key in [k for k, (_, last_used, _) in self._clients.items() if now - last_used > self.idle_seconds]:
+            client, _, transport = self._clients.pop(key)
+            self._models.pop(key, None)
+            self._retired.append((client, transport))
+        still_busy = []
+        for client, transport in self._retired:
+            if transport.active > 0:
+                still_busy.append((client, transport))
+                continue
+            try:
+                client.close()
+            except Exception as e:
+                logging.warning(f"Error closing idle Groq client: {e}")
+        self._retired = still_busy
+
+    def list_models(self, api_key):
+        """All model ids for this key, cached for models_ttl seconds"""
+        key = key_id(api_key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._models.get(key)
+            if cached is not None and now - cached[0] < self.models_ttl:
+                return cached[1]
+        models = self.get(api_key).models.list()
+        model_list = models.data if hasattr(models, 'data') else models
+        model_ids = [model.id for model in model_list]
+        logging.info(f"Fetched {len(model_ids)} models")
+        with self._lock:
+            self._models[key] = (now, model_ids)
+        return model_ids
+
+    def list_vision_models(self, api_key):
+        return [model_id for model_id in self.list_models(api_key)
+                if any(keyword in model_id.lower() for keyword in VISION_KEYWORDS)]
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "created": self.created, "reused": self.reused}
+
+
+registry = GroqClientRegistry(
+    max_connections=int(os.environ.get('GROQ_MAX_CONNECTIONS', '20')),
+    idle_seconds=float(os.environ.get('GROQ_CLIENT_IDLE_SECONDS', '900')),
+    models_ttl=float(os.environ.get('GROQ_MODELS_TTL_SECONDS', '300')),
+)
+
+
+def get_client(api_key):
+    """Shared Groq client for an API key"""
+    return registry.get(api_key)
@@ -0,0 +1,196 @@
+import os
+import math
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(p / 100 * len(samples)) - 1))   # nearest rank
+        return samples[index]
+
+
+class _Attempts:
+    """Tracks whether a call is inside its HTTP request, as opposed to queued, throttled or backing off.
+
+    Passed to the wrapped call as ``track``: the call wraps only the HTTP
+    request in ``track(request)``, so latencies and hedge delays leave out
+    rate-limit waits and retry backoff.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self._cond = threading.Condition()
+        self._since = None
+        self._finished = False
+
+    def __call__(self, request):
+        with self._cond:
+            self._since = time.monotonic()
+            self._cond.notify_all()
+        try:
+            result = request()
+        finally:
+            with self._cond:
+                elapsed = time.monotonic() - self._since
+                self._since = None
+                self._cond.notify_all()
+        self.latency.record(elapsed)
+        return result
+
+    def finish(self, _future=None):
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def overdue(self, delay):
+        """Block until the current request has run for `delay` seconds (True) or the call ended (False)"""
+        with self._cond:
+            while not self._finished:
+                if self._since is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._since + delay - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+
+def _start(fn, track):
+    """fn(track) on its own thread: no shared pool for calls to queue in"""
+    future = Future()
+
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(track))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name="hedge", daemon=True).start()
+    return future
+
+
+class HedgePolicy:
+    """Issue a second (hedge) request when a call's HTTP request runs past a latency percentile.
+
+    ``primary`` and ``hedge`` are called with a ``track`` wrapper that must
+    enclose only the HTTP request (not rate-limit waits or retry backoff).
+    Latencies are recorded from those requests. Once the primary's current
+    request has been running for the tracked ``percentile`` of recent
+    latencies (clamped to ``min_delay``..``max_delay``), a hedge call is
+    started - optionally against a fallback model - and whichever finishes
+    first successfully is returned. The loser is left to finish in the
+    background (an HTTP call can't be recalled). Hedges are capped at
+    ``budget`` times the number of calls so the extra quota spent stays
+    bounded, and no hedging happens until ``min_samples`` latencies have been
+    seen; until then (or when disabled) the primary runs on the caller's thread.
+    """
+
+    def __init__(self, enabled=False, percentile=95.0, min_delay=2.0, max_delay=20.0, budget=0.05,
+                 min_samples=20, fallback_model=None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self.fallback_model = fallback_model or None
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "primary_won": 0, "over_budget": 0}
+
+    def hedge_delay(self):
+        """Seconds to wait for the primary before hedging, or None while there is too little history"""
+        if len(self.latency) < self.min_samples:
+            return None
+        return min(self.max_delay, max(self.min_delay, self.latency.percentile(self.percentile)))
+
+    def _allow_hedge(self):
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.budget * self.stats["calls"]:
+                self.stats["over_budget"] += 1
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def run(self, primary, hedge=None):
+        """(result, winner): primary(track)'s result, or hedge(track)'s (defaults to primary) if that finished first.
+
+        winner is "primary" or "hedge", so callers can tell when a fallback model answered.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+        attempts = _Attempts(self.latency)
+        delay = self.hedge_delay() if self.enabled else None
+        if delay is None:
+            return primary(attempts), "primary"
+
+        primary_future = _start(primary, attempts)
+        primary_future.add_done_callback(attempts.finish)
+        if not attempts.overdue(delay) or not self._allow_hedge():
+            return primary_future.result(), "primary"
+
+        logging.info(f"Request exceeded p{self.percentile:g} latency ({delay:.1f}s), sending a hedge request")
+        hedge_future = _start(hedge or primary, _Attempts(self.latency))
+        pending = {primary_future, hedge_future}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                winner = "hedge" if future is hedge_future else "primary"
+                with self._lock:
+                    self.stats[f"{winner}_won"] += 1
+                return future.result(), winner
+        raise error
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["delay_seconds"] = self.hedge_delay()
+        stats["fallback_model"] = self.fallback_model
+        return stats
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_hedge_policy():
+    """Process-wide hedging policy configured from HEDGE_* environment variables (off by default)"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = HedgePolicy(
+                enabled=os.environ.get('HEDGE_ENABLED', '0').lower() in ('1', 'true', 'yes'),
+                percentile=float(os.environ.get('HEDGE_PERCENTILE', '95')),
+                min_delay=float(os.environ.get('HEDGE_MIN_DELAY_SECONDS', '2')),
+                budget=float(os.environ.get('HEDGE_BUDGET', '0.05')),
+                fallback_model=os.environ.get('HEDGE_FALLBACK_MODEL'),
+            )
+        return _policy
@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """In-memory LRU of values derived from image files, bounded by total bytes.
+
+    Entries are keyed by (path, variant) so one file can have several derived
+    forms cached side by side (e.g. base64 for JSON, display renditions).
+    Each lookup re-stats the file and treats an entry whose mtime or size no
+    longer matches as stale, so a file replaced at the same path is never
+    served from cache. ``invalidate(path)`` drops only that file's entries.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, path, loader, variant=""):
+        """Return the cached value for (path, variant), calling loader(path) on a miss"""
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        key = (path, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader(path)
+        nbytes = len(value)
+        with self._lock:
+            self._discard(key)
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (signature, value, nbytes)
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_bytes
+        return value
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, path):
+        """Drop every cached variant of one file"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._bytes}
@@ -0,0 +1,233 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Seconds: from fast parses to slow model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTE_BUCKETS = (16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}       # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                out.append((self.name + "_bucket", key, (("le", le),), cumulative))
+            out.append((self.name + "_count", key, (), cumulative))
+            out.append((self.name + "_sum", key, (), series[-1]))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        result = []
+        for key, series in items:
+            count = sum(series[:-1])
+            result.append({"labels": dict(zip(self.labelnames, key)), "count": count, "sum": series[-1],
+                           "mean": series[-1] / count if count else None,
+                           "buckets": dict(zip([f"{b:g}" for b in self.buckets] + ["+Inf"], series[:-1]))})
+        return result
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text format.
+
+    Instruments (counters, histograms) are updated in place by the code they
+    measure. Collectors are callables returning ``(name, type, help, labels,
+    value)`` tuples read at render time; they export the counters the caches,
+    rate-limit governor and friends already keep, without double-counting.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collected(self):
+        rows = []
+        for collector in list(self._collectors):
+            try:
+                rows.extend(collector())
+            except Exception:
+                continue    # a broken collector must not take /metrics down
+        return rows
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {value:g}")
+        seen = set()
+        for name, kind, help, labels, value in self._collected():
+            if value is None:
+                continue
+            if name not in seen:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                seen.add(name)
+            labels = labels or {}
+            lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly dump of every metric (for end-of-run reports)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {metric.name: {"type": metric.type, "help": metric.help, "series": metric.snapshot()}
+                  for metric in metrics}
+        for name, kind, help, labels, value in self._collected():
+            entry = result.setdefault(name, {"type": kind, "help": help, "series": []})
+            entry["series"].append({"labels": labels or {}, "value": value})
+        return result
+
+
+def _series_key(series):
+    return tuple(sorted(series["labels"].items()))
+
+
+def delta(start, end):
+    """What changed between two registry snapshots (end - start); gauges keep their end value"""
+    result = {}
+    for name, entry in end.items():
+        before = {_series_key(s): s for s in start.get(name, {}).get("series", [])}
+        series = []
+        for s in entry["series"]:
+            prev = before.get(_series_key(s))
+            if entry["type"] == "gauge":
+                series.append(s)
+            elif entry["type"] == "histogram":
+                count = s["count"] - (prev["count"] if prev else 0)
+                if count:
+                    total = s["sum"] - (prev["sum"] if prev else 0)
+                    buckets = {b: n - (prev["buckets"].get(b, 0) if prev else 0) for b, n in s["buckets"].items()}
+                    series.append({"labels": s["labels"], "count": count, "sum": total, "mean": total / count,
+                                   "buckets": buckets})
+            else:
+                value = s["value"] - (prev["value"] if prev else 0)
+                if value:
+                    series.append({"labels": s["labels"], "value": value})
+        result[name] = {"type": entry["type"], "help": entry["help"], "series": series}
+    return result
+
+registry = MetricsRegistry()
+
+# Pipeline instruments shared by web_app.py and batch_processor.py
+IMAGE_DECODE_SECONDS = registry.histogram(
+    "ocr_image_decode_seconds", "Time to decode a source image for the API payload")
+IMAGE_ENCODE_SECONDS = registry.histogram(
+    "ocr_image_encode_seconds", "Time to resize and JPEG-encode an API payload (cached=true: payload cache read)",
+    ("encoder", "cached"))
+PAYLOAD_BYTES = registry.histogram(
+    "ocr_payload_bytes", "Size of encoded image payloads", ("encoder",), buckets=BYTE_BUCKETS)
+GROQ_REQUEST_SECONDS = registry.histogram(
+    "groq_request_seconds", "Groq chat completion latency including governor waits and retries",
+    ("model", "mode", "outcome"))
+GROQ_REQUEST_BYTES = registry.counter(
+    "groq_request_image_bytes_total", "Base64 image bytes sent to Groq", ("model",))
+GROQ_IMAGES = registry.counter(
+    "groq_request_images_total", "Images sent to Groq (packed requests count each image)", ("model", "mode"))
+PARSE_SECONDS = registry.histogram(
+    "ocr_parse_seconds", "Time to parse a model response", ("mode",))
+WRITE_SECONDS = registry.histogram(
+    "ocr_write_seconds", "Time to write the .txt and .json sidecars for one image")
+PDF_RENDER_SECONDS = registry.histogram(
+    "pdf_render_page_seconds", "Time to rasterize and save one PDF page")
+ERRORS = registry.counter(
+    "ocr_errors_total", "Failed conversions by exception class", ("stage", "error"))
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+import logging
+
+CACHE_FILENAME = ".ocr_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    mode       TEXT NOT NULL,
+    text       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+)
+"""
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode("utf-8") if isinstance(value, str) else value).hexdigest()
+
+
+class OCRResultCache:
+    """Persistent, content-addressed cache of model transcriptions.
+
+    Entries are keyed by a hash of the preprocessed image payload plus the
+    model, processing mode and prompt hash, so any change to what would be
+    sent to Groq is a miss. Entries older than ``max_age_days`` are dropped,
+    and the least recently used ones go once the stored text exceeds ``max_bytes``.
+    """
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, max_age_days=30, evict_every=50):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(payload, model, mode, prompt_text):
+        """Cache key for one request: payload hash + model + mode + prompt hash"""
+        return _sha256("\0".join((_sha256(payload), model, mode, _sha256(prompt_text))))
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, mode, text):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, model, mode, text, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, mode, text, len(text.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self._evict(now)
+
+    def evict(self):
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.max_age,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total > self.max_bytes:
+            # Walk entries from least recently used and drop until back under budget
+            cutoff = None
+            for last_used, size in self._conn.execute("SELECT last_used, size FROM results ORDER BY last_used"):
+                total -= size
+                cutoff = last_used
+                if total <= self.max_bytes:
+                    break
+            if cutoff is not None:
+                self._conn.execute("DELETE FROM results WHERE last_used <= ?", (cutoff,))
+        self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(directory):
+    """Shared cache stored under `directory`, or None when OCR_CACHE_ENABLED=0"""
+    if os.environ.get("OCR_CACHE_ENABLED", "1") == "0":
+        return None
+    path = os.path.join(os.path.abspath(directory), CACHE_FILENAME)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                cache = OCRResultCache(
+                    path,
+                    max_bytes=int(os.environ.get("OCR_CACHE_MAX_MB", "100")) * 1024 * 1024,
+                    max_age_days=float(os.environ.get("OCR_CACHE_MAX_AGE_DAYS", "30")),
+                )
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"OCR result cache unavailable at {path}: {e}")
+                return None
+            _caches[path] = cache
+        return cache
+
+
+def all_cache_stats():
+    """Stats for every cache opened in this process, keyed by database path"""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {path: cache.stats() for path, cache in caches.items()}
@@ -0,0 +1,47 @@
+import re
+
+# Groq accepts at most 5 images per chat request
+MAX_PACK_SIZE = 5
+
+_MARKER_RE = re.compile(r"^[ \t]*=+[ \t]*IMAGE[ \t]+(\d+)[ \t]*=+[ \t]*$", re.MULTILINE | re.IGNORECASE)
+
+
+class PackSplitError(ValueError):
+    """A packed response could not be split back into exactly one section per image"""
+
+
+def pack_prompt(prompt_text, count):
+    """Wrap a mode's single-image prompt in the delimiter schema for `count` images"""
+    return (
+        f"You are given {count} separate images, numbered 1 to {count} in the order they appear. "
+        "Treat each image as its own document and follow these instructions for each one:\n\n"
+        f"{prompt_text}\n\n"
+        f"Output format: for each image k from 1 to {count}, print a line containing exactly "
+        "'=== IMAGE k ===' followed by that image's complete output. Do not combine or compare "
+        "images and do not print anything before the first marker."
+    )
+
+
+def build_pack_messages(prompt_text, base64_images):
+    """One user message with the packed prompt and a numbered image_url part per image"""
+    content = [{"type": "text", "text": pack_prompt(prompt_text, len(base64_images))}]
+    for number, base64_image in enumerate(base64_images, 1):
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}})
+    return [{"role": "user", "content": content}]
+
+
+def split_pack_response(content, count):
+    """Per-image sections of a packed response, in image order; raises PackSplitError"""
+    markers = list(_MARKER_RE.finditer(content or ""))
+    numbers = [int(m.group(1)) for m in markers]
+    if numbers != list(range(1, count + 1)):
+        raise PackSplitError(f"expected markers for images 1-{count}, found {numbers}")
+    sections = []
+    for k, marker in enumerate(markers):
+        end = markers[k + 1].start() if k + 1 < len(markers) else len(content)
+        section = content[marker.end():end].strip()
+        if not section:
+            raise PackSplitError(f"empty output for image {k + 1}")
+        sections.append(section)
+    return sections
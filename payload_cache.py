@@ -0,0 +1,134 @@
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+
+
+class PayloadCache:
+    """Disk cache of encoded API payloads (the compressed JPEG bytes sent to Groq).
+
+    Entries are keyed by source path, mtime, size and the encoder settings, so
+    replacing a file or changing how images are encoded is automatically a
+    miss. Files are written atomically, which lets the web app, batch runs and
+    preprocessing worker processes share one directory. The least recently
+    used entries (by file mtime, refreshed on every hit) are evicted once the
+    directory exceeds ``max_bytes``.
+    """
+
+    SUFFIX = ".payload"
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def make_key(image_path, settings):
+        st = os.stat(image_path)
+        parts = [os.path.abspath(image_path), str(st.st_mtime_ns), str(st.st_size)]
+        parts.extend(f"{name}={settings[name]}" for name in sorted(settings))
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _entries(self):
+        """(path, size, mtime) for every cached payload"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((entry.path, st.st_size, st.st_mtime))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size     # an overwrite only adds the difference
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write payload cache entry {path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self._total += len(data) - replaced
+            over_budget = self._total > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used payloads until the directory is back under max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    total -= size
+                except OSError as e:
+                    logging.warning(f"Could not evict payload cache entry {path}: {e}")
+            self._total = total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._total}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_payload_cache():
+    """Process-wide payload cache, or None when PAYLOAD_CACHE_ENABLED=0 / the directory is unusable"""
+    global _cache
+    if os.environ.get("PAYLOAD_CACHE_ENABLED", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            directory = os.environ.get("PAYLOAD_CACHE_DIRECTORY",
+                                       os.path.join(tempfile.gettempdir(), "o-ocr-payloads"))
+            try:
+                _cache = PayloadCache(directory,
+                                      max_bytes=int(os.environ.get("PAYLOAD_CACHE_MAX_MB", "256")) * 1024 * 1024)
+            except OSError as e:
+                logging.warning(f"Payload cache unavailable at {directory}: {e}")
+                return None
+        return _cache
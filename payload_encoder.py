@@ -0,0 +1,140 @@
+import io
+import os
+import math
+import time
+import logging
+
+from PIL import Image, ImageChops, ImageStat
+
+try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+except ImportError:
+    pillow_heif = None
+
+# Never shrink below this while trying to get under the hard cap
+FLOOR_EDGE = 256
+
+
+class PayloadError(ValueError):
+    """An image could not be decoded, or not encoded under the hard payload cap"""
+
+
+def _env_number(name, default, kind=int):
+    """Numeric setting from the environment; an invalid value logs a warning and uses the default"""
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        return kind(raw)
+    except ValueError:
+        logging.warning(f"Ignoring invalid {name} value {raw!r}, using {default}")
+        return default
+
+
+def _env_choice(name, default, choices):
+    value = os.environ.get(name, default)
+    if value not in choices:
+        logging.warning(f"Ignoring invalid {name} value {value!r}, using {default}")
+        return default
+    return value
+
+
+def payload_settings():
+    """Encoder settings from the environment; the dict is part of the payload cache key"""
+    return {
+        "format": "JPEG",
+        # fixed: one JPEG at max_size/quality. adaptive: search size, quality and grayscale for target_bytes
+        "encoder": _env_choice('PAYLOAD_ENCODER', 'fixed', ('fixed', 'adaptive')),
+        "max_size": _env_number('PAYLOAD_MAX_EDGE', 1024),
+        "min_size": _env_number('PAYLOAD_MIN_EDGE', 768),
+        "quality": _env_number('PAYLOAD_QUALITY', 75),
+        "target_bytes": int(_env_number('PAYLOAD_TARGET_KB', 250.0, float) * 1024),
+        "max_bytes": int(_env_number('PAYLOAD_MAX_KB', 3072.0, float) * 1024),
+        # auto | always | never (adaptive only)
+        "grayscale": _env_choice('PAYLOAD_GRAYSCALE', 'auto', ('auto', 'always', 'never')),
+    }
+
+
+def looks_grayscale(img, tolerance=6.0):
+    """True when the colour channels barely differ (typed forms, photocopies, pencil on white)"""
+    sample = img.convert('RGB')
+    sample.thumbnail((64, 64))
+    r, g, b = sample.split()
+    spread = ImageStat.Stat(ImageChops.difference(r, g)).mean[0] + ImageStat.Stat(ImageChops.difference(g, b)).mean[0]
+    return spread / 2 < tolerance
+
+
+def _jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _quality_ladder(quality):
+    return tuple(range(quality, 39, -10)) or (quality,)
+
+
+def _search(img, budget, start_edge, floor_edge, qualities):
+    """Largest edge (from start_edge down to floor_edge) with a quality that fits budget.
+
+    Returns (data, size, quality, fits): the first fit, or the smallest
+    attempt with fits=False if nothing did.
+    """
+    edge = start_edge
+    smallest = None
+    while True:
+        candidate = img.copy()
+        candidate.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        for quality in qualities:
+            data = _jpeg(candidate, quality)
+            if len(data) <= budget:
+                return data, candidate.size, quality, True
+            if len(data) > budget * 2:
+                break       # lower quality rarely halves the size: shrink instead
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = (data, candidate.size, quality, False)
+        if edge <= floor_edge:
+            return smallest
+        # JPEG size scales roughly with pixel count: jump straight to an edge that should fit
+        scale = min(0.9, max(0.5, math.sqrt(budget / len(data)) * 0.95))
+        edge = max(floor_edge, int(edge * scale))
+
+
+def encode_image(image_path, settings):
+    """JPEG bytes for the API plus a description of what was sent; raises PayloadError"""
+    start = time.perf_counter()
+    try:
+        with Image.open(image_path) as src:
+            img = src.convert('RGB') if src.mode != 'RGB' else src.copy()
+    except Exception as e:
+        # The raw file is never sent in its place: it may be huge, and is often not a JPEG
+        raise PayloadError(f"Cannot decode {os.path.basename(image_path)}: {e}") from e
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    max_size, max_bytes = settings["max_size"], settings["max_bytes"]
+    grayscale = False
+    if settings["encoder"] == "adaptive":
+        mode = settings["grayscale"]
+        grayscale = mode == "always" or (mode == "auto" and looks_grayscale(img))
+        if grayscale:
+            img = img.convert('L')
+        qualities = _quality_ladder(settings["quality"])
+        data, size, quality, fits = _search(img, min(settings["target_bytes"], max_bytes), max_size,
+                                            min(settings["min_size"], max_size), qualities)
+        if not fits and len(data) > max_bytes:
+            # The target is soft, the cap is not: keep shrinking below min_size
+            data, size, quality, fits = _search(img, max_bytes, max(size), FLOOR_EDGE, qualities[-1:])
+    else:
+        fixed = img.copy()
+        fixed.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        data, size, quality = _jpeg(fixed, settings["quality"]), fixed.size, settings["quality"]
+        if len(data) > max_bytes:
+            data, size, quality, fits = _search(img, max_bytes, max_size, FLOOR_EDGE,
+                                                _quality_ladder(settings["quality"]))
+
+    if len(data) > max_bytes:
+        raise PayloadError(f"{os.path.basename(image_path)} does not fit in {max_bytes} bytes "
+                           f"even at {size[0]}x{size[1]}")
+    return data, {"bytes": len(data), "width": size[0], "height": size[1], "quality": quality,
+                  "grayscale": grayscale, "encoder": settings["encoder"], "decode_ms": round(decode_ms, 2)}
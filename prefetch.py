@@ -0,0 +1,105 @@
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+
+
+class Prefetcher:
+    """Bounded, cancellable background preparation of the next items in a queue.
+
+    Work is grouped by ``owner`` (one reviewer session), ``kind`` (e.g.
+    display renditions, OCR) and ``variant`` (e.g. the model/mode an OCR
+    result is for). Each ``prefetch`` call names the items that owner wants
+    now; the owner's queued work of the same kind that is no longer wanted
+    (the reviewer moved on, or switched model/mode) is cancelled, so at most
+    one window of tasks per owner and kind is pending. Other owners' windows
+    are left alone.
+    Tasks already running are left to finish since their results land in a
+    cache anyway. Results are not stored here: ``fn`` is expected to fill a
+    cache that the request path reads.
+    """
+
+    def __init__(self, window=0, workers=2):
+        self.window = window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") if window > 0 else None
+        self._pending = {}       # (owner, kind, variant, item) -> Future
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self._executor is not None
+
+    def prefetch(self, kind, items, fn, variant="", owner=""):
+        """Run fn(item) in the background for each item not already pending; drop the owner's stale queued work"""
+        if not self.enabled:
+            return
+        wanted = set(items)
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if future.done():
+                    del self._pending[key]
+                elif key[:2] == (owner, kind) and (key[2] != variant or key[3] not in wanted):
+                    if future.cancel():
+                        self.cancelled += 1
+                    del self._pending[key]
+            for item in items:
+                key = (owner, kind, variant, item)
+                if key not in self._pending:
+                    self._pending[key] = self._executor.submit(self._run, fn, item)
+                    self.submitted += 1
+
+    def _run(self, fn, item):
+        try:
+            fn(item)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logging.warning(f"Prefetch of {item} failed: {e}")
+
+    def wait(self, kind, item, variant="", timeout=None, owner=""):
+        """Block until a running prefetch of this item finishes; True if there was one.
+
+        A prefetch still queued behind other work is cancelled instead, so the
+        caller does the work now rather than waiting for the queue to drain.
+        """
+        with self._lock:
+            key = (owner, kind, variant, item)
+            future = self._pending.get(key)
+            if future is None:
+                return False
+            if future.cancel():
+                self.cancelled += 1
+                del self._pending[key]
+                return False
+        try:
+            future.exception(timeout=timeout)
+        except (CancelledError, FutureTimeout):
+            return False
+        return True
+
+    def cancel(self):
+        """Cancel everything still queued"""
+        with self._lock:
+            for future in self._pending.values():
+                if future.cancel():
+                    self.cancelled += 1
+            self._pending.clear()
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for future in self._pending.values() if not future.done())
+        return {"window": self.window, "pending": pending, "submitted": self.submitted,
+                "cancelled": self.cancelled, "failed": self.failed}
+
+
+def prefetch_window():
+    """Number of upcoming images to prepare in the background (env: PREFETCH_WINDOW, 0 = off)"""
+    return max(0, int(os.environ.get('PREFETCH_WINDOW', '0')))
+
+
+def prefetch_ocr_enabled():
+    """Also pre-run OCR for the current model/mode (env: PREFETCH_OCR=1); spends API quota speculatively"""
+    return os.environ.get('PREFETCH_OCR', '0').lower() in ('1', 'true', 'yes')
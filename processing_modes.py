@@ -0,0 +1,277 @@
+import os
+import json
+import stat
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Tuple
+
+CUSTOM_SETTINGS_PATH = os.environ.get(
+    'CUSTOM_POEM_SETTINGS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'custom_poem_settings.json'))
+
+CUSTOM_PROMPT_TEMPLATE = (
+    "Transcribe everything in this image including {document_contains}. "
+    "Preserve exact formatting, line breaks, and punctuation. "
+    "Use [?] for unclear words. At the end, add exactly these lines:\n"
+    "POEM_TITLE: [actual title]\n"
+    "POEM_THEME: [theme]\n"
+    "POEM_LANGUAGE: [language]\n"
+    "CUSTOM_STRUCTURE: {structure}\n"
+    "Confidence: X/10"
+)
+
+DEFAULT_CUSTOM_SETTINGS = {
+    "name": "Custom Poem",
+    "description": "User-defined poem structure and content",
+    "structure": "Free verse with custom requirements",
+    "document_contains": ["Student name", "School name", "Poem text"]
+}
+
+# Used when custom_poem_settings.json is missing or malformed
+CUSTOM_FALLBACK_PROMPT = (
+    "Transcribe everything in this image including student name, school name, and poem text. "
+    "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
+    "At the end, add: POEM_TITLE: [title]\nPOEM_THEME: [theme]\nPOEM_LANGUAGE: [language]\nConfidence: X/10"
+)
+
+
+@dataclass(frozen=True)
+class ProcessingMode:
+    """A processing mode: its prompt, which parser reads the reply, and the fields the prompt asks for"""
+    name: str
+    label: str
+    prompt: str
+    parser: str = "legacy"              # "zip_ode" (structured schema) or "legacy" (trailing metadata lines)
+    fields: Tuple[str, ...] = ()
+
+    def to_json(self):
+        return {'value': self.name, 'label': self.label, 'fields': list(self.fields)}
+
+
+POEM_FIELDS = ("POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "Confidence")
+
+BUILTIN_MODES = (
+    ProcessingMode(
+        name="poem",
+        label="Student Poems (SUN Room)",
+        prompt=(
+            "Transcribe everything in this image including student name, school name at the top, "
+            "and the complete poem below. Preserve exact formatting, line breaks, and punctuation. "
+            "Use [?] for unclear words. At the end, add exactly these 4 lines with no additional text:\n"
+            "POEM_TITLE: [actual title]\n"
+            "POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"
+            "POEM_LANGUAGE: [language name]\n"
+            "Confidence: X/10"
+        ),
+        fields=POEM_FIELDS,
+    ),
+    ProcessingMode(
+        name="freeform",
+        label="Free Form OCR",
+        prompt=(
+            "Transcribe all text in this image exactly as it appears. Preserve formatting, line breaks, and punctuation. "
+            "Use [?] for unclear words. At the end, add exactly these 4 lines with no additional text:\n"
+            "DOCUMENT_TITLE: [best guess at title or 'Unknown']\n"
+            "DOCUMENT_TYPE: [worksheet, form, letter, notes, or other]\n"
+            "LANGUAGE: [language name]\n"
+            "Confidence: X/10"
+        ),
+        fields=("DOCUMENT_TITLE", "DOCUMENT_TYPE", "LANGUAGE", "Confidence"),
+    ),
+    ProcessingMode(
+        name="zip_ode_explain",
+        label="Zipcode (Zip Ode)",
+        prompt=(
+            "You are helping with O, Miami's 'Zip Ode' poems.\n\n"
+            "Task:\n"
+            "1) Transcribe all visible text exactly (preserve line breaks, punctuation; use [?] for unclear).\n"
+            "2) Extract these fields when possible:\n"
+            "   - STUDENT_NAME: (if present at top)\n"
+            "   - SCHOOL_NAME: (if present at top)\n"
+            "   - ZIP_CODE: (5 digits; if multiple appear, choose the one associated with the poem)\n"
+            "3) Identify the poem body (exclude headings/names).\n"
+            "4) Output a compact report exactly in the schema below (no extra commentary).\n\n"
+            "Schema (print exactly these keys, one per line, then the poem):\n"
+            "TRANSCRIPTION:\n"
+            "<full raw transcription here>\n\n"
+            "STUDENT_NAME: <string or Unknown>\n"
+            "SCHOOL_NAME: <string or Unknown>\n"
+            "ZIP_CODE: <##### or Unknown>\n\n"
+            "POEM:\n"
+            "<only the poem lines here, one per line, in order>\n\n"
+            "POEM_TITLE: <best short title or Unknown>\n"
+            "POEM_THEME: <one word: family, nature, friendship, school, emotions, seasons, miami, or sun>\n"
+            "POEM_LANGUAGE: <language name>\n"
+            "Confidence: <X/10>"
+        ),
+        parser="zip_ode",
+        fields=("TRANSCRIPTION", "STUDENT_NAME", "SCHOOL_NAME", "ZIP_CODE", "POEM") + POEM_FIELDS,
+    ),
+    ProcessingMode(
+        name="postcard_poem",
+        label="Post Card Poem",
+        prompt=(
+            "Transcribe this postcard poem including any student name, school name, and the complete poem. "
+            "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
+            "At the end, add exactly these lines:\n"
+            "POEM_TITLE: [actual title or 'Postcard Poem']\n"
+            "POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"
+            "POEM_LANGUAGE: [language name]\n"
+            "POSTCARD_TYPE: [greeting, travel, art, or other]\n"
+            "Confidence: X/10"
+        ),
+        fields=("POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "POSTCARD_TYPE", "Confidence"),
+    ),
+    ProcessingMode(
+        name="worksheet_poem",
+        label="Worksheet Poem",
+        prompt=(
+            "Transcribe this worksheet including student name, any instructions, and the poem content. "
+            "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
+            "At the end, add exactly these lines:\n"
+            "POEM_TITLE: [actual title or worksheet title]\n"
+            "POEM_THEME: [one word: family, nature, friendship, school, emotions, seasons, miami, or sun]\n"
+            "POEM_LANGUAGE: [language name]\n"
+            "WORKSHEET_TYPE: [creative writing, fill-in-blank, template, or other]\n"
+            "Confidence: X/10"
+        ),
+        fields=("POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "WORKSHEET_TYPE", "Confidence"),
+    ),
+    ProcessingMode(
+        name="survey_form",
+        label="Non-Poem Survey Form",
+        prompt=(
+            "Transcribe this survey form including all questions, answers, and participant information. "
+            "Look for checkboxes (☐ ☑ ✓ ✗ X) and circles around answers. "
+            "Mark checked boxes as [✓] and unchecked as [☐]. Mark circled answers as (CIRCLED). "
+            "Preserve exact formatting, line breaks, and punctuation. Use [?] for unclear words. "
+            "At the end, add exactly these lines:\n"
+            "FORM_TITLE: [survey title or 'Survey Form']\n"
+            "FORM_TYPE: [feedback, evaluation, questionnaire, or other]\n"
+            "LANGUAGE: [language name]\n"
+            "PARTICIPANT_NAME: [if visible or 'Unknown']\n"
+            "Confidence: X/10"
+        ),
+        fields=("FORM_TITLE", "FORM_TYPE", "LANGUAGE", "PARTICIPANT_NAME", "Confidence"),
+    ),
+)
+
+# Order modes are offered in the UI
+MODE_ORDER = ("poem", "freeform", "zip_ode_explain", "custom_poem", "postcard_poem", "worksheet_poem", "survey_form")
+
+
+def build_custom_mode(settings):
+    """ProcessingMode for the user-defined custom_poem settings (None falls back to the generic prompt)"""
+    try:
+        prompt = settings['prompt_template'].format(
+            document_contains=', '.join(settings['document_contains']),
+            structure=settings['structure']
+        )
+    except (TypeError, KeyError, IndexError, ValueError):
+        prompt = CUSTOM_FALLBACK_PROMPT
+    return ProcessingMode(
+        name="custom_poem",
+        label="Custom Poem",
+        prompt=prompt,
+        fields=("POEM_TITLE", "POEM_THEME", "POEM_LANGUAGE", "CUSTOM_STRUCTURE", "Confidence"),
+    )
+
+
+class ModeRegistry:
+    """Processing modes built once; custom_poem is rebuilt only when its settings file changes.
+
+    Lookups stat the settings file and reload it only if its mtime moved, so
+    a batch no longer re-reads and re-parses the JSON for every image.
+    ``save_custom_settings`` writes the file atomically and swaps the new mode
+    in under the lock, so concurrent lookups see either the old or new prompt.
+    """
+
+    def __init__(self, settings_path=CUSTOM_SETTINGS_PATH):
+        self.settings_path = settings_path
+        self._modes = {mode.name: mode for mode in BUILTIN_MODES}
+        self._lock = threading.Lock()
+        self._settings_mtime = None
+        self._custom_settings = None
+        self.reloads = 0
+        self._load_custom()
+
+    def _settings_stat(self):
+        try:
+            return os.stat(self.settings_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_custom(self):
+        mtime = self._settings_stat()
+        try:
+            with open(self.settings_path, 'r') as f:
+                settings = json.load(f)['custom_poem']
+        except (FileNotFoundError, KeyError, TypeError, json.JSONDecodeError) as e:
+            if mtime is not None:
+                logging.warning(f"Could not load {self.settings_path}: {e}")
+            settings = None
+        self._custom_settings = settings
+        self._modes["custom_poem"] = build_custom_mode(settings)
+        self._settings_mtime = mtime
+        self.reloads += 1
+
+    def _refresh(self):
+        if self._settings_stat() != self._settings_mtime:
+            with self._lock:
+                if self._settings_stat() != self._settings_mtime:
+                    self._load_custom()
+
+    def get(self, name):
+        """The ProcessingMode for a mode name; raises ValueError for unknown modes"""
+        if name == "custom_poem":
+            self._refresh()
+        mode = self._modes.get(name)
+        if mode is None:
+            raise ValueError(f"Unknown processing_mode: {name}")
+        return mode
+
+    def modes(self):
+        """All modes in UI order"""
+        self._refresh()
+        return [self._modes[name] for name in MODE_ORDER]
+
+    def custom_settings(self):
+        """Current custom_poem settings (defaults if the file is missing)"""
+        self._refresh()
+        settings = self._custom_settings
+        return dict(settings) if settings is not None else dict(DEFAULT_CUSTOM_SETTINGS)
+
+    def save_custom_settings(self, settings):
+        """Persist new custom_poem settings atomically and make them live immediately"""
+        settings = dict(settings, prompt_template=CUSTOM_PROMPT_TEMPLATE)
+        mode = build_custom_mode(settings)
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.settings_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.custom_poem_settings.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'custom_poem': settings}, f, indent=2)
+                # mkstemp creates 0600 files: keep the settings file readable outside the container
+                try:
+                    file_mode = stat.S_IMODE(os.stat(self.settings_path).st_mode)
+                except FileNotFoundError:
+                    file_mode = 0o644
+                os.chmod(tmp_path, file_mode)
+                os.replace(tmp_path, self.settings_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._custom_settings = settings
+            self._modes["custom_poem"] = mode
+            self._settings_mtime = self._settings_stat()
+        return mode
+
+
+registry = ModeRegistry()
+
+
+def get_mode(name):
+    """Shared registry lookup"""
+    return registry.get(name)
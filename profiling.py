@@ -0,0 +1,148 @@
+import time
+import math
+import pstats
+import cProfile
+import threading
+import logging
+from contextlib import contextmanager
+
+STAGES = ("encode", "transcribe", "parse", "write")
+
+
+class StageTimings:
+    """Wall and CPU milliseconds per pipeline stage for one image.
+
+    CPU time is the current thread's (time.thread_time), so concurrent
+    workers don't inflate each other's numbers; time spent blocked on the
+    network or the rate-limit governor shows up as wall time only.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, histogram=None, **labels):
+        """Time a with-block as stage `name`, also observing its wall time in a metrics histogram"""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            self.record(name, wall * 1000, cpu * 1000)
+            if histogram is not None:
+                histogram.observe(wall, **labels)
+
+    def record(self, name, wall_ms, cpu_ms=None):
+        entry = {"wall_ms": round(wall_ms, 2)}
+        if cpu_ms is not None:
+            entry["cpu_ms"] = round(cpu_ms, 2)
+        self.stages[name] = entry
+
+    def to_dict(self):
+        return self.stages
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+class RunSummary:
+    """Aggregates per-image result records into a per-run stage breakdown"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.images = 0
+        self.failed = 0
+        self.payload_bytes = []
+        self.walls = {}
+        self.cpus = {}
+
+    def add(self, result):
+        self.images += 1
+        if "error" in result:
+            self.failed += 1
+        payload = result.get("payload") or {}
+        if payload.get("bytes") is not None:
+            self.payload_bytes.append(payload["bytes"])
+        for name, entry in (result.get("timings") or {}).items():
+            self.walls.setdefault(name, []).append(entry["wall_ms"])
+            if "cpu_ms" in entry:
+                self.cpus.setdefault(name, []).append(entry["cpu_ms"])
+        return result
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        stages = {}
+        for name in sorted(self.walls, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+            walls, cpus = self.walls[name], self.cpus.get(name, [])
+            stages[name] = {
+                "count": len(walls),
+                "wall_ms_total": round(sum(walls), 1),
+                "wall_ms_mean": round(sum(walls) / len(walls), 2),
+                "wall_ms_p95": round(_percentile(walls, 95), 2),
+                "cpu_ms_total": round(sum(cpus), 1) if cpus else None,
+            }
+        payload = self.payload_bytes
+        return {
+            "images": self.images,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 2),
+            "images_per_second": round(self.images / elapsed, 3) if elapsed > 0 else None,
+            "payload_bytes": {"total": sum(payload), "mean": round(sum(payload) / len(payload)) if payload else None,
+                              "max": max(payload) if payload else None},
+            "stages": stages,
+        }
+
+    def log(self):
+        summary = self.to_dict()
+        logging.info(f"Run summary: {summary['images']} images in {summary['elapsed_seconds']}s "
+                     f"({summary['failed']} failed), payload {summary['payload_bytes']['total']} bytes")
+        for name, stage in summary["stages"].items():
+            cpu = f", cpu {stage['cpu_ms_total']}ms" if stage["cpu_ms_total"] is not None else ""
+            logging.info(f"  {name:<10} total {stage['wall_ms_total']}ms, mean {stage['wall_ms_mean']}ms, "
+                         f"p95 {stage['wall_ms_p95']}ms{cpu}")
+        return summary
+
+
+class RunProfiler:
+    """Opt-in cProfile sampling of batch work units, merged into one pstats dump.
+
+    Every ``every``-th image (by input position) is run under cProfile. Only
+    one profiler can be active at a time, so sampled units run one after
+    another even with several workers; unsampled units are unaffected. Only
+    the worker thread is profiled: encodes in the preprocessing pool and
+    hedge requests run elsewhere.
+    """
+
+    def __init__(self, every=1):
+        self.every = max(1, int(every))
+        self.sampled = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def wants(self, position):
+        return (position - 1) % self.every == 0
+
+    def run(self, fn):
+        with self._lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return fn()
+            finally:
+                profile.disable()
+                self.sampled += 1
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def dump(self, path):
+        """Write the merged stats (load with pstats.Stats(path)); False when nothing was sampled"""
+        with self._lock:
+            if self._stats is None:
+                return False
+            self._stats.dump_stats(path)
+        logging.info(f"Profile of {self.sampled} sampled work unit(s) saved to {path}")
+        return True
@@ -0,0 +1,196 @@
+import os
+import re
+import random
+import threading
+import time
+import logging
+
+import groq
+
+# Groq reports reset windows as Go-style durations, e.g. "2m59.56s", "7.66s", "120ms"
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+# Errors worth retrying: quota, transient network trouble and server-side failures
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APITimeoutError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+)
+
+
+def parse_duration(value):
+    """Parse a rate-limit reset/Retry-After value into seconds (None if unparseable)"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity/period"""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= amount
+
+    def sync(self, remaining, now):
+        """Align the bucket with the server's view of the remaining budget"""
+        self._refill(now)
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimitGovernor:
+    """Shared RPM/TPM budget and retry policy for every Groq chat call in the process.
+
+    Callers reserve one request plus an estimated token count before each call,
+    then report the real usage from ``chat_completion.usage``. 429 responses and
+    transient failures are retried with jittered exponential backoff; a
+    ``Retry-After`` header pauses every caller, not just the one that hit it.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=30000, max_retries=5,
+                 base_delay=1.0, max_delay=60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "waited_seconds": 0.0}
+
+    def acquire(self, estimated_tokens):
+        """Block until one request and `estimated_tokens` fit in the budget, then reserve them"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(
+                    self._blocked_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(estimated_tokens, now),
+                )
+                if delay <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(estimated_tokens)
+                    self.stats["waited_seconds"] += waited
+                    return
+            time.sleep(delay)
+            waited += delay
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token reservation once the real usage is known"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def update_from_headers(self, headers):
+        """Sync the buckets with Groq's x-ratelimit-* response headers"""
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                bucket.sync(remaining, now)
+                if remaining < 1:
+                    # Budget exhausted server-side: hold everyone until the window resets
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, fn, estimated_tokens):
+        """Run ``fn()`` under the budget, retrying retryable Groq errors.
+
+        ``fn`` must return a raw response (``.with_raw_response``) so the
+        rate-limit headers can be read; the parsed completion is returned.
+        """
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens)
+            with self._lock:
+                self.stats["calls"] += 1
+            try:
+                raw = fn()
+            except RETRYABLE_ERRORS as e:
+                self.record_usage(estimated_tokens, 0)
+                if attempt >= self.max_retries:
+                    raise
+                response = getattr(e, "response", None)
+                headers = response.headers if response is not None else None
+                retry_after = parse_duration(headers.get("retry-after")) if headers else None
+                self.update_from_headers(headers)
+                delay = self.backoff_delay(attempt, retry_after)
+                with self._lock:
+                    self.stats["retries"] += 1
+                    if isinstance(e, groq.RateLimitError):
+                        self.stats["rate_limited"] += 1
+                        if retry_after is not None:
+                            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                logging.warning(f"Groq call failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.update_from_headers(raw.headers)
+            completion = raw.parse()
+            usage = getattr(completion, "usage", None)
+            self.record_usage(estimated_tokens, getattr(usage, "total_tokens", None))
+            return completion
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Process-wide governor configured from GROQ_RPM_LIMIT / GROQ_TPM_LIMIT / GROQ_MAX_RETRIES"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateLimitGovernor(
+                requests_per_minute=int(os.environ.get("GROQ_RPM_LIMIT", "30")),
+                tokens_per_minute=int(os.environ.get("GROQ_TPM_LIMIT", "30000")),
+                max_retries=int(os.environ.get("GROQ_MAX_RETRIES", "5")),
+            )
+        return _governor
@@ -0,0 +1,205 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from processing_modes import BUILTIN_MODES, build_custom_mode, get_mode
+from student_info import StudentInfo
+
+# -----------------------------
+# Helpers for local validation
+# -----------------------------
+_WORD_RE = re.compile(r"[A-Za-z0-9']+")
+
+def word_count(s: str) -> int:
+    return len(_WORD_RE.findall(s or ""))
+
+def zip_digits(zipcode: str):
+    if not zipcode or not isinstance(zipcode, str):
+        return []
+    return [int(d) for d in zipcode if d.isdigit()]
+
+def validate_poem_lines(lines, zipcode: str):
+    """Local validator (optional, independent of the model's table)"""
+    zip_pattern = zip_digits(zipcode) if zipcode and zipcode.isdigit() else []
+    rows = []
+    for i, need in enumerate(zip_pattern, start=1):
+        line = lines[i - 1] if i - 1 < len(lines) else ""
+        have = word_count(line)
+        ok = (have == need if need > 0 else have == 0)
+        rows.append(
+            {"line": i, "expected": need, "actual": have, "ok": ok, "text": line}
+        )
+    overall = bool(zip_pattern) and len(lines) == len(zip_pattern) and all(r["ok"] for r in rows)
+    return {"rows": rows, "overall_ok": overall}
+
+
+# -----------------------------
+# Tokenizer
+# -----------------------------
+# Every key any mode's schema asks for; matched case-insensitively (as the
+# model sometimes writes "Confidence:" or "zip_code:"), also as the end of a
+# TRANSCRIPTION:/POEM: block. Other UPPER_SNAKE keys (e.g. ZIP_ODE_EXPLANATION)
+# are picked up too, but plain words like "Name:" inside a transcription are
+# left as text. Known keys that are ordinary words (LANGUAGE) only end a block
+# when upper-case, so a poem line such as "Language: ..." stays in it.
+KNOWN_KEYS = frozenset(key.upper() for mode in BUILTIN_MODES + (build_custom_mode(None),) for key in mode.fields)
+_WORD_KEYS = frozenset(key for key in KNOWN_KEYS if '_' not in key) - {"CONFIDENCE", "TRANSCRIPTION", "POEM"}
+
+_KEY_LINE = re.compile(r"^\s*([A-Za-z][A-Za-z0-9_]*)\s*:\s*(.*?)\s*$")
+
+NAME_KEYS = ("STUDENT_NAME", "PARTICIPANT_NAME")
+
+
+def _match_key(line, in_block=False):
+    m = _KEY_LINE.match(line)
+    if m is None:
+        return None, None
+    raw = m.group(1)
+    key = raw.upper()
+    if key in KNOWN_KEYS:
+        if in_block and key in _WORD_KEYS and not raw.isupper():
+            return None, None
+        return key, m.group(2)
+    if raw.isupper() and '_' in raw:
+        return key, m.group(2)
+    return None, None
+
+
+@dataclass
+class ParsedResponse:
+    """Everything extracted from one model response in a single pass.
+
+    ``fields`` holds the first non-empty ``KEY: value`` for every key (keys
+    upper-cased, e.g. POSTCARD_TYPE, FORM_TITLE, CONFIDENCE); ``blocks`` holds
+    the text under a label that stands alone on its line (TRANSCRIPTION:,
+    POEM:) up to the next key. ``text`` is the response with its Confidence
+    line removed, which is what the editor shows.
+    """
+    structured: bool = False
+    fields: Dict[str, str] = field(default_factory=dict)
+    blocks: Dict[str, str] = field(default_factory=dict)
+    text: str = ""
+    confidence: str = ""
+    header_student: str = ""
+    header_school: str = ""
+
+    def block(self, key):
+        """Block under a standalone label, or the label's inline value"""
+        return self.blocks[key] if key in self.blocks else self.fields.get(key, "")
+
+    def _named(self, keys, header):
+        for key in keys:
+            value = self.fields.get(key)
+            if value and value.lower() != "unknown":
+                return value
+        return header
+
+    @property
+    def student_name(self):
+        if self.structured:
+            return self.fields.get("STUDENT_NAME", "Unknown")
+        return self._named(NAME_KEYS, self.header_student)
+
+    @property
+    def school_name(self):
+        if self.structured:
+            return self.fields.get("SCHOOL_NAME", "Unknown")
+        return self._named(("SCHOOL_NAME",), self.header_school)
+
+    @property
+    def zip_code(self):
+        return self.fields.get("ZIP_CODE", "Unknown") if self.structured else ""
+
+    @property
+    def poem_title(self):
+        return self.fields.get("POEM_TITLE", "")
+
+    @property
+    def poem_theme(self):
+        return self.fields.get("POEM_THEME", "")
+
+    @property
+    def poem_language(self):
+        return self.fields.get("POEM_LANGUAGE", "")
+
+    @property
+    def poem_lines(self) -> List[str]:
+        return [ln.rstrip() for ln in self.block("POEM").splitlines() if ln.strip() != ""]
+
+    def student_info(self):
+        return StudentInfo(self.student_name, self.school_name, self.poem_title, self.poem_theme, self.poem_language)
+
+    def to_zip_ode_dict(self):
+        """The zip_ode_explain report, with the poem checked against the zip code locally"""
+        poem_lines = self.poem_lines
+        zip_code = self.zip_code
+        validation_rows = []
+        if zip_code and zip_code.isdigit():
+            validation_result = validate_poem_lines(poem_lines, zip_code)
+            validation_rows = validation_result["rows"]
+            overall_ok = str(validation_result["overall_ok"])
+        else:
+            overall_ok = "Unknown"
+
+        return {
+            "student_name": self.student_name,
+            "school_name": self.school_name,
+            "zip_code": zip_code,
+            "poem_title": self.poem_title,
+            "poem_theme": self.poem_theme,
+            "poem_language": self.poem_language,
+            "transcription": self.block("TRANSCRIPTION"),
+            "poem_lines": poem_lines,
+            "validation_rows": validation_rows,
+            "overall_ok": overall_ok
+        }
+
+
+def tokenize(content, structured=False):
+    """Single linear pass over the response lines into a ParsedResponse"""
+    record = ParsedResponse(structured=structured)
+    fields, blocks = record.fields, record.blocks
+    body = []
+    block_key, block_lines = None, []
+
+    for i, raw_line in enumerate(content.split('\n')):
+        line = raw_line.strip()
+        if line.startswith('Confidence:') or line.startswith('(Confidence:'):
+            record.confidence = line
+        else:
+            body.append(raw_line)
+
+        key, value = _match_key(raw_line, in_block=block_key is not None)
+        if key is not None:
+            if block_key is not None:
+                blocks.setdefault(block_key, '\n'.join(block_lines).strip())
+                block_key = None
+            if value:
+                fields.setdefault(key, value)
+            else:
+                block_key, block_lines = key, []
+            continue
+
+        if block_key is not None:
+            block_lines.append(raw_line)
+
+        # Legacy header heuristic: name and school are usually in the first few lines
+        if i < 5 and not structured:
+            if 'School:' in line or 'school' in line.lower():
+                school = line.split(':')[-1].strip() if ':' in line else line
+                record.header_school = re.sub(r'(?i)\bschool\b', '', school).strip()
+            elif line and not line.startswith('Grade'):
+                if 'Name:' in line:
+                    record.header_student = line.split('Name:')[-1].strip()
+                elif not record.header_student and len(line.split()) <= 4:
+                    record.header_student = line
+
+    if block_key is not None:
+        blocks.setdefault(block_key, '\n'.join(block_lines).strip())
+    record.text = '\n'.join(body)
+    return record
+
+
+def parse_response(content, processing_mode="zip_ode_explain"):
+    """Parse a model response with the parser its processing mode declares"""
+    return tokenize(content, structured=get_mode(processing_mode).parser == "zip_ode")
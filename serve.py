@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Serve the web app on gevent so slow Groq calls don't tie up request threads.
+
+Sockets are monkey-patched before the app is imported, so every Groq round
+trip (and SSE stream, and file download) waits cooperatively on the event
+loop instead of blocking an OS thread. Routes and JSON responses are exactly
+those of web_app.py.
+
+    python serve.py    # HOST, PORT and WEB_MAX_CONNECTIONS are read from the environment
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import logging
+
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from web_app import app
+
+
+def main():
+    host = os.environ.get('HOST', '0.0.0.0')
+    port = int(os.environ.get('PORT', '5002'))
+    max_connections = int(os.environ.get('WEB_MAX_CONNECTIONS', '200'))
+
+    server = WSGIServer((host, port), app, spawn=Pool(max_connections))
+    logging.info(f"Serving on http://{host}:{port} (gevent, up to {max_connections} concurrent connections)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
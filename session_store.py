@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import secrets
+import sqlite3
+import threading
+import logging
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+SESSION_FILENAME = ".sessions.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid        TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class SessionStore:
+    """SQLite table of session dicts keyed by session ID.
+
+    Rows expire ``max_age`` seconds after their last write; expired rows are
+    ignored on read and purged every ``purge_every`` writes.
+    """
+
+    def __init__(self, path, max_age=31 * 24 * 60 * 60, purge_every=100):
+        self.path = path
+        self.max_age = max_age
+        self.purge_every = purge_every
+        self.reads = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def load(self, sid):
+        """The stored dict for sid, or None if it is unknown or expired"""
+        with self._lock:
+            self.reads += 1
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sid, data):
+        with self._lock:
+            self.writes += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                (sid, json.dumps(data), time.time() + self.max_age),
+            )
+            if self.writes % self.purge_every == 0:
+                self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def delete(self, sid):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            live = self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"sessions": live, "reads": self.reads, "writes": self.writes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its ID and whether it was changed"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.retired_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh session ID (call on login/logout against session fixation)"""
+        if self.retired_sid is None and not self.new:
+            self.retired_sid = self.sid
+        self.sid = secrets.token_urlsafe(24)
+        self.new = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask sessions kept in a SessionStore; the cookie only carries a signed session ID.
+
+    Sessions are written back only when modified, and an empty session is
+    never stored (or is deleted, along with its cookie). After
+    ServerSession.regenerate() the old ID's row is deleted and a new cookie
+    is sent. The database is
+    opened on first use at session_store_path(); if that fails, sessions are
+    kept in memory for the life of the process.
+    """
+
+    def __init__(self, max_age=31 * 24 * 60 * 60):
+        self.max_age = max_age
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                path = session_store_path()
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                    self._store = SessionStore(path, max_age=self.max_age)
+                except (OSError, sqlite3.Error) as e:
+                    logging.warning(f"Session store unavailable at {path}, keeping sessions in memory: {e}")
+                    self._store = SessionStore(":memory:", max_age=self.max_age)
+            return self._store
+
+    def stats(self):
+        """Store counters, or None before the first session was read or written"""
+        return self._store.stats() if self._store is not None else None
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="server-session")
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("ascii")
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.load(sid)
+                if data is not None:
+                    return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.retired_sid is not None:
+            self.store.delete(session.retired_sid)
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+        self.store.save(session.sid, dict(session))
+        if session.new or session.permanent:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode("ascii")).decode("ascii"),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+        response.vary.add("Cookie")
+
+
+def session_store_path():
+    """Session database location (env: SESSION_STORE_PATH, default next to the OCR outputs)"""
+    default = os.path.join(os.environ.get('OUTPUT_DIRECTORY', os.getcwd()), SESSION_FILENAME)
+    return os.environ.get('SESSION_STORE_PATH', default)
+
+
+def init_app(app):
+    """Switch app to server-side sessions unless SESSION_BACKEND=cookie; returns the interface (or None)"""
+    if os.environ.get('SESSION_BACKEND', 'sqlite') == 'cookie':
+        return None
+    app.session_interface = ServerSessionInterface(max_age=app.permanent_session_lifetime.total_seconds())
+    return app.session_interface
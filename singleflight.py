@@ -0,0 +1,67 @@
+import threading
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or the same exception).
+    Nothing is remembered once the call finishes - caching is left to the
+    caller - so a later request for the key runs again.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0          # executions actually performed
+        self.coalesced = 0      # requests answered by another request's execution
+        self.duplicated = 0     # executions that had at least one duplicate request waiting
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+                if flight.followers == 1:
+                    self.duplicated += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "duplicated": self.duplicated,
+                    "in_flight": len(self._flights)}
+
+
+# Shared by every BatchImageProcessor in the process (web requests, prefetch and batch runs)
+ocr_flights = SingleFlight()
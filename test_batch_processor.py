@@ -1,9 +1,26 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 import os
 import json
-from batch_processor import BatchImageProcessor
+import shutil
+import threading
+import tempfile
+from PIL import Image
+from batch_processor import BatchImageProcessor, encode_image_payload
 from student_info import StudentInfo
+from rate_limiter import RateLimitGovernor
+
+def _write_image(path, color="white"):
+    """A small real JPEG: payloads are decoded and re-encoded before any API call"""
+    Image.new("RGB", (64, 64), color).save(path, "JPEG")
+
+def _raw_completion(content):
+    """What chat.completions.with_raw_response.create returns, as read by the rate-limit governor"""
+    raw = MagicMock()
+    raw.headers = {}
+    raw.parse.return_value.choices[0].message.content = content
+    raw.parse.return_value.usage.total_tokens = 100
+    return raw
 
 class TestBatchImageProcessor(unittest.TestCase):
 
@@ -13,8 +30,7 @@ class TestBatchImageProcessor(unittest.TestCase):
         self.test_dir = "test_images"
         os.makedirs(self.test_dir, exist_ok=True)
         self.test_image = os.path.join(self.test_dir, "test_image.jpg")
-        with open(self.test_image, "w") as f:
-            f.write("test")
+        _write_image(self.test_image)
 
     def tearDown(self):
         os.remove(self.test_image)
@@ -38,6 +54,202 @@ class TestBatchImageProcessor(unittest.TestCase):
         text = self.processor.convert_image_to_text(self.test_image)
         self.assertEqual(text, "test")
 
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_concurrent_keeps_order(self, mock_request_transcription):
+        mock_request_transcription.side_effect = lambda path, *a, **kw: f"Name: {os.path.basename(path)}"
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        try:
+            names = [f"img_{i:02d}.jpg" for i in range(10)]
+            for name in reversed(names):
+                _write_image(os.path.join(input_dir, name))
+            results = self.processor.process_directory(input_dir, output_dir, processing_mode="poem", max_workers=4)
+            self.assertEqual([r["filename"] for r in results], names)
+            self.assertFalse([r for r in results if "error" in r])
+            with open(os.path.join(output_dir, "batch_results.json")) as f:
+                self.assertEqual([r["filename"] for r in json.load(f)], names)
+        finally:
+            shutil.rmtree(input_dir)
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_does_not_save_errors(self, mock_request_transcription):
+        mock_request_transcription.side_effect = RuntimeError("Error code: 429")
+        output_dir = tempfile.mkdtemp()
+        try:
+            results = self.processor.process_directory(self.test_dir, output_dir, processing_mode="poem")
+            self.assertEqual(len(results), 1)
+            self.assertIn("429", results[0]["error"])
+            self.assertFalse([f for f in os.listdir(output_dir) if f.endswith(".txt")])
+        finally:
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_resume_skips_completed(self, mock_request_transcription):
+        mock_request_transcription.return_value = "Name: Test"
+        output_dir = tempfile.mkdtemp()
+        extra_image = os.path.join(self.test_dir, "second.jpg")
+        try:
+            self.processor.process_directory(self.test_dir, output_dir, processing_mode="poem")
+            _write_image(extra_image)
+            mock_request_transcription.reset_mock()
+
+            results = self.processor.process_directory(self.test_dir, output_dir, processing_mode="poem", resume=True)
+
+            mock_request_transcription.assert_called_once()
+            self.assertEqual(mock_request_transcription.call_args[0][0], extra_image)
+            self.assertEqual([r["filename"] for r in results], ["second.jpg", "test_image.jpg"])
+        finally:
+            os.remove(extra_image)
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_jsonl_streams_records(self, mock_request_transcription):
+        mock_request_transcription.return_value = "Name: Test"
+        output_dir = tempfile.mkdtemp()
+        try:
+            summaries = self.processor.process_directory(self.test_dir, output_dir, processing_mode="poem",
+                                                         output_format="jsonl")
+            self.assertEqual(summaries, [{"filename": "test_image.jpg", "saved_as": "Test.txt"}])
+            with open(os.path.join(output_dir, "batch_results.jsonl")) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(records[0]["converted_text"], "Name: Test")
+            self.assertGreater(records[0]["payload"]["bytes"], 0)
+            self.assertIn("encode_ms", records[0]["payload"])
+        finally:
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_iter_directory_yields_results(self, mock_request_transcription):
+        mock_request_transcription.return_value = "Name: Test"
+        output_dir = tempfile.mkdtemp()
+        try:
+            results = list(self.processor.iter_directory(self.test_dir, output_dir, processing_mode="poem"))
+            self.assertEqual([r["filename"] for r in results], ["test_image.jpg"])
+        finally:
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_preprocess_pool_supplies_payloads(self, mock_request_transcription):
+        mock_request_transcription.return_value = "Name: Test"
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        try:
+            Image.new("RGB", (2000, 1000), "white").save(os.path.join(input_dir, "scan.png"))
+            self.processor.process_directory(input_dir, output_dir, processing_mode="poem",
+                                             max_workers=2, preprocess_workers=1)
+            base64_image = mock_request_transcription.call_args[1]["base64_image"]
+            self.assertEqual(base64_image, encode_image_payload(os.path.join(input_dir, "scan.png")))
+        finally:
+            shutil.rmtree(input_dir)
+            shutil.rmtree(output_dir)
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_stops_when_cancelled(self, mock_request_transcription):
+        cancel_event = threading.Event()
+        progress = []
+
+        def transcribe(*args, **kwargs):
+            cancel_event.set()
+            return "Name: Test"
+        mock_request_transcription.side_effect = transcribe
+        extra_image = os.path.join(self.test_dir, "second.jpg")
+        _write_image(extra_image)
+        output_dir = tempfile.mkdtemp()
+        try:
+            results = self.processor.process_directory(
+                self.test_dir, output_dir, processing_mode="poem", cancel_event=cancel_event,
+                progress_callback=lambda done, total, result: progress.append((done, total)))
+            self.assertEqual(len(results), 1)
+            self.assertEqual(progress, [(0, 2), (1, 2)])
+        finally:
+            os.remove(extra_image)
+            shutil.rmtree(output_dir)
+
+    def _packed_run(self, responses):
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        try:
+            for name, color in (("a.jpg", "red"), ("b.jpg", "green"), ("c.jpg", "blue")):
+                _write_image(os.path.join(input_dir, name), color)
+            self.processor.client = MagicMock()
+            self.processor.client.chat.completions.with_raw_response.create.side_effect = \
+                [_raw_completion(text) for text in responses]
+            self.processor.governor = RateLimitGovernor(requests_per_minute=1000, tokens_per_minute=10**7)
+            results = self.processor.process_directory(input_dir, output_dir, processing_mode="postcard_poem",
+                                                       pack_size=3)
+            return results, self.processor.client.chat.completions.with_raw_response.create
+        finally:
+            shutil.rmtree(input_dir)
+            shutil.rmtree(output_dir)
+
+    def test_process_directory_packs_images_into_one_request(self):
+        results, create = self._packed_run([
+            "=== IMAGE 1 ===\nAna\nPOEM_TITLE: Red\n=== IMAGE 2 ===\nBen\nPOEM_TITLE: Green\n"
+            "=== IMAGE 3 ===\nCam\nPOEM_TITLE: Blue"])
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(len(create.call_args[1]["messages"][0]["content"]), 7)
+        self.assertEqual([r["poem_title"] for r in results], ["Red", "Green", "Blue"])
+        self.assertEqual({r["packed"] for r in results}, {3})
+
+    def test_process_directory_pack_falls_back_to_single_requests(self):
+        results, create = self._packed_run(["Three poems, no markers",
+                                            "POEM_TITLE: Red", "POEM_TITLE: Green", "POEM_TITLE: Blue"])
+        self.assertEqual(create.call_count, 4)
+        self.assertEqual([r["poem_title"] for r in results], ["Red", "Green", "Blue"])
+        self.assertFalse([r for r in results if "packed" in r])
+
+    @patch('batch_processor.BatchImageProcessor.request_transcription')
+    def test_process_directory_records_stage_timings_and_profile(self, mock_request_transcription):
+        mock_request_transcription.return_value = "POEM_TITLE: Sun"
+        output_dir = tempfile.mkdtemp()
+        try:
+            profile_path = os.path.join(output_dir, "run.pstats")
+            results = self.processor.process_directory(self.test_dir, output_dir, processing_mode="poem",
+                                                       profile_path=profile_path)
+            self.assertEqual(set(results[0]["timings"]), {"encode", "transcribe", "parse", "write"})
+            self.assertIn("cpu_ms", results[0]["timings"]["parse"])
+            with open(os.path.join(output_dir, "batch_results.summary.json")) as f:
+                summary = json.load(f)
+            self.assertEqual(summary["images"], 1)
+            self.assertEqual(summary["stages"]["write"]["count"], 1)
+            self.assertGreater(summary["payload_bytes"]["total"], 0)
+            import pstats
+            self.assertTrue(pstats.Stats(profile_path).total_calls)
+        finally:
+            shutil.rmtree(output_dir)
+
+    def test_single_flight_is_scoped_to_the_api_key(self):
+        other = BatchImageProcessor(api_key="other-key")
+        key = "cache-key"
+        self.assertNotEqual(self.processor._flight_key(key), other._flight_key(key))
+        self.assertEqual(self.processor._flight_key(key), BatchImageProcessor(api_key="test")._flight_key(key))
+
+    def test_hedge_on_fallback_model_is_cached_under_that_model(self):
+        from ocr_cache import OCRResultCache
+        from processing_modes import get_mode
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self.processor.result_cache = OCRResultCache(os.path.join(cache_dir, "cache.sqlite3"))
+            self.processor.client = MagicMock()
+            self.processor.client.chat.completions.with_raw_response.create.return_value = \
+                _raw_completion("POEM_TITLE: Fallback")
+            self.processor.governor = RateLimitGovernor(requests_per_minute=1000, tokens_per_minute=10**7)
+            self.processor.hedger = MagicMock(fallback_model="fallback-model")
+            self.processor.hedger.run.side_effect = lambda primary, hedge: (hedge(lambda request: request()), "hedge")
+
+            details = {}
+            text = self.processor.request_transcription(self.test_image, "primary-model", "poem", details=details)
+            self.assertEqual((text, details["model"]), ("POEM_TITLE: Fallback", "fallback-model"))
+            payload = encode_image_payload(self.test_image)
+            prompt = get_mode("poem").prompt
+            cache = self.processor.result_cache
+            self.assertIsNone(cache.get(OCRResultCache.make_key(payload, "primary-model", "poem", prompt)))
+            self.assertEqual(cache.get(OCRResultCache.make_key(payload, "fallback-model", "poem", prompt)), text)
+        finally:
+            self.processor.result_cache.close()
+            shutil.rmtree(cache_dir)
+
     def test_parse_zip_ode_response(self):
         content = """STUDENT_NAME: John Doe
 SCHOOL_NAME: Test School
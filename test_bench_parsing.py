@@ -0,0 +1,25 @@
+import random
+import unittest
+from bench_parsing import generate_response, build_corpus, run, compare
+from response_parser import parse_response
+
+
+class TestBenchParsing(unittest.TestCase):
+
+    def test_generated_responses_parse(self):
+        rng = random.Random(0)
+        record = parse_response(generate_response(rng, "zip_ode_explain", missing_rate=0), "zip_ode_explain")
+        self.assertEqual(len(record.poem_lines), 5)
+        self.assertTrue(record.zip_code.isdigit())
+        self.assertEqual(len(build_corpus(20)), 20)
+
+    def test_compare_flags_regressions(self):
+        results = run(corpus_size=10, min_time=0.001, only=["word_count"])
+        self.assertGreater(results["word_count"]["ops_per_sec"], 0)
+        faster = {"results": {"word_count": {"ops_per_sec": results["word_count"]["ops_per_sec"] * 10}}}
+        self.assertEqual(compare(results, faster), ["word_count"])
+        self.assertEqual(compare(results, {"results": {}}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
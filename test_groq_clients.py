@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from groq_clients import GroqClientRegistry
+
+
+class TestGroqClientRegistry(unittest.TestCase):
+
+    def test_same_key_reuses_client(self):
+        registry = GroqClientRegistry()
+        first = registry.get("key-a")
+        self.assertIs(registry.get("key-a"), first)
+        self.assertIsNot(registry.get("key-b"), first)
+        self.assertEqual(registry.stats(), {"clients": 2, "created": 2, "reused": 1})
+
+    def test_idle_entries_are_dropped(self):
+        registry = GroqClientRegistry(idle_seconds=0)
+        first = registry.get("key-a")
+        with patch('groq_clients.time.monotonic', return_value=10**9):
+            self.assertIsNot(registry.get("key-a"), first)
+
+    def test_evicted_clients_are_closed_once_no_request_is_in_flight(self):
+        registry = GroqClientRegistry(idle_seconds=0)
+        busy = registry.get("key-a")
+        registry._clients[next(iter(registry._clients))][2].active = 1
+        with patch('groq_clients.time.monotonic', return_value=10**9):
+            registry.get("key-b")
+        self.assertFalse(busy._client.is_closed)
+        self.assertEqual(len(registry._retired), 1)
+        registry._retired[0][1].active = 0
+        with patch('groq_clients.time.monotonic', return_value=10**10):
+            registry.get("key-b")
+        self.assertTrue(busy._client.is_closed)
+        self.assertEqual(registry._retired, [])
+
+    def test_in_flight_count_drops_when_the_response_is_closed(self):
+        import httpx
+        from groq_clients import _CountingTransport
+        class Body(httpx.SyncByteStream):
+            def __iter__(self):
+                yield b"{}"
+
+        transport = _CountingTransport()
+        with patch.object(httpx.HTTPTransport, 'handle_request', return_value=httpx.Response(200, stream=Body())):
+            response = transport.handle_request(httpx.Request("GET", "https://example.invalid"))
+            self.assertEqual(transport.active, 1)
+            response.read()
+            response.close()
+            response.close()
+        self.assertEqual(transport.active, 0)
+
+    def test_model_list_is_cached(self):
+        registry = GroqClientRegistry(models_ttl=300)
+        client = MagicMock()
+        client.models.list.return_value.data = [MagicMock(id="llama-4-scout"), MagicMock(id="whisper-large-v3")]
+        with patch.object(registry, 'get', return_value=client):
+            self.assertEqual(registry.list_vision_models("key-a"), ["llama-4-scout"])
+            self.assertEqual(registry.list_vision_models("key-a"), ["llama-4-scout"])
+        self.assertEqual(client.models.list.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import time
+import threading
+import unittest
+from hedging import HedgePolicy, LatencyTracker
+
+
+class TestHedgePolicy(unittest.TestCase):
+
+    def _policy(self, **kwargs):
+        policy = HedgePolicy(enabled=True, percentile=50, min_delay=0.01, min_samples=3, budget=1.0, **kwargs)
+        for _ in range(3):
+            policy.latency.record(0.01)
+        return policy
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for seconds in range(1, 101):
+            tracker.record(seconds)
+        self.assertEqual(tracker.percentile(95), 95)
+        self.assertEqual(tracker.percentile(50), 50)
+
+    def test_disabled_policy_calls_directly(self):
+        policy = HedgePolicy(enabled=False)
+        self.assertEqual(policy.run(lambda track: track(lambda: "text"), lambda track: self.fail("no hedge")),
+                         ("text", "primary"))
+        self.assertEqual(len(policy.latency), 1)
+
+    def test_slow_primary_is_hedged_and_hedge_wins(self):
+        policy = self._policy()
+        release = threading.Event()
+        result = policy.run(lambda track: track(lambda: release.wait(5) and "primary"),
+                            lambda track: track(lambda: "hedge"))
+        release.set()
+        self.assertEqual(result, ("hedge", "hedge"))
+        self.assertEqual(policy.stats["hedged"], 1)
+        self.assertEqual(policy.stats["hedge_won"], 1)
+
+    def test_fast_primary_is_not_hedged(self):
+        policy = self._policy()
+        self.assertEqual(policy.run(lambda track: track(lambda: "primary"), lambda track: self.fail("no hedge")),
+                         ("primary", "primary"))
+        self.assertEqual(policy.stats["hedged"], 0)
+
+    def test_budget_caps_hedges(self):
+        policy = self._policy()
+        policy.budget = 0.0
+        result = policy.run(lambda track: track(lambda: time.sleep(0.05) or "primary"),
+                            lambda track: self.fail("over budget"))
+        self.assertEqual(result, ("primary", "primary"))
+        self.assertEqual(policy.stats["over_budget"], 1)
+
+    def test_failed_hedge_falls_back_to_primary(self):
+        policy = self._policy()
+
+        def hedge(track):
+            raise RuntimeError("fallback model unavailable")
+        self.assertEqual(policy.run(lambda track: track(lambda: time.sleep(0.05) or "primary"), hedge),
+                         ("primary", "primary"))
+        self.assertEqual(policy.stats["primary_won"], 1)
+
+    def test_throttled_primary_is_not_hedged_and_waits_are_not_timed(self):
+        policy = self._policy()
+        # Queued behind the rate-limit governor for longer than the hedge delay, then a fast request
+        result = policy.run(lambda track: time.sleep(0.1) or track(lambda: "primary"),
+                            lambda track: self.fail("a throttled call must not be hedged"))
+        self.assertEqual(result, ("primary", "primary"))
+        self.assertEqual(policy.stats["hedged"], 0)
+        self.assertLess(policy.latency.percentile(100), 0.05)
+
+    def test_many_concurrent_calls_are_not_queued(self):
+        policy = self._policy()
+        policy.min_delay = policy.max_delay = 5.0
+        release = threading.Event()
+        results = []
+
+        def call():
+            results.append(policy.run(lambda track: track(lambda: release.wait(5) and "primary")))
+
+        threads = [threading.Thread(target=call) for _ in range(40)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(results), 40)
+        self.assertEqual(policy.stats["hedged"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+from image_cache import ImageCache
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = ImageCache(max_bytes=10)
+        self.paths = []
+        for name in ("a.jpg", "b.jpg"):
+            path = os.path.join(self.tmp_dir, name)
+            with open(path, "wb") as f:
+                f.write(b"12345")
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_hit_after_load(self):
+        loader = MagicMock(side_effect=self._read)
+        self.cache.get_or_load(self.paths[0], loader)
+        self.cache.get_or_load(self.paths[0], loader)
+        self.assertEqual(loader.call_count, 1)
+
+    def test_replaced_file_is_reloaded(self):
+        self.cache.get_or_load(self.paths[0], self._read)
+        with open(self.paths[0], "wb") as f:
+            f.write(b"123")
+        self.assertEqual(self.cache.get_or_load(self.paths[0], self._read), b"123")
+
+    def test_bounded_by_bytes(self):
+        extra = os.path.join(self.tmp_dir, "c.jpg")
+        with open(extra, "wb") as f:
+            f.write(b"12345")
+        for path in self.paths + [extra]:
+            self.cache.get_or_load(path, self._read)
+        stats = self.cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"]), (2, 10))
+
+    def test_invalidate_only_drops_one_file(self):
+        for path in self.paths:
+            self.cache.get_or_load(path, self._read)
+        self.cache.invalidate(self.paths[0])
+        self.assertEqual(self.cache.stats()["entries"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from PIL import Image
+import metrics
+from metrics import MetricsRegistry
+from batch_processor import BatchImageProcessor, DEFAULT_MODEL
+from rate_limiter import RateLimitGovernor
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counter_renders_labelled_series(self):
+        registry = MetricsRegistry()
+        errors = registry.counter("errors_total", "Errors", ("error",))
+        errors.inc(error="RateLimitError")
+        errors.inc(2, error="RateLimitError")
+        errors.inc(error='Bad"Quote')
+        text = registry.render()
+        self.assertIn("# TYPE errors_total counter", text)
+        self.assertIn('errors_total{error="RateLimitError"} 3', text)
+        self.assertIn('errors_total{error="Bad\\"Quote"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value, model="scout")
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{model="scout",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{model="scout",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{model="scout",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{model="scout"} 4', text)
+        self.assertIn('latency_seconds_sum{model="scout"} 6.05', text)
+
+    def test_time_records_failures_too(self):
+        registry = MetricsRegistry()
+        parse = registry.histogram("parse_seconds", "Parse time")
+        with self.assertRaises(ValueError):
+            with parse.time():
+                raise ValueError("bad response")
+        self.assertEqual(parse.snapshot()[0]["count"], 1)
+
+    def test_collectors_are_read_at_render_time_and_failures_skipped(self):
+        registry = MetricsRegistry()
+        hits = {"value": 1}
+        registry.register_collector(lambda: [("cache_hits_total", "counter", "Hits", None, hits["value"])])
+        registry.register_collector(lambda: 1 / 0)
+        hits["value"] = 7
+        self.assertIn("cache_hits_total 7", registry.render())
+        self.assertEqual(registry.snapshot()["cache_hits_total"]["series"], [{"labels": {}, "value": 7}])
+
+    def test_delta_keeps_only_what_changed_since_the_start_snapshot(self):
+        registry = MetricsRegistry()
+        errors = registry.counter("errors_total", "Errors", ("error",))
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(1.0,))
+        size = {"bytes": 10}
+        registry.register_collector(lambda: [("cache_bytes", "gauge", "Size", None, size["bytes"])])
+        errors.inc(error="Timeout")
+        latency.observe(0.5)
+        start = registry.snapshot()
+        errors.inc(2, error="RateLimitError")
+        latency.observe(2.0)
+        size["bytes"] = 30
+        changed = metrics.delta(start, registry.snapshot())
+        self.assertEqual(changed["errors_total"]["series"], [{"labels": {"error": "RateLimitError"}, "value": 2}])
+        self.assertEqual(changed["latency_seconds"]["series"],
+                         [{"labels": {}, "count": 1, "sum": 2.0, "mean": 2.0, "buckets": {"1": 0, "+Inf": 1}}])
+        self.assertEqual(changed["cache_bytes"]["series"], [{"labels": {}, "value": 30}])
+
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def test_batch_run_records_stages_and_dumps_metrics(self):
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        try:
+            Image.new("RGB", (64, 64), "white").save(os.path.join(input_dir, "a.jpg"), "JPEG")
+            processor = BatchImageProcessor(input_dir, "test", cache_directory=output_dir)
+            processor.result_cache = None
+            raw = MagicMock()
+            raw.headers = {}
+            raw.parse.return_value.choices[0].message.content = "POEM_TITLE: Sun"
+            raw.parse.return_value.usage.total_tokens = 100
+            processor.client = MagicMock()
+            processor.client.chat.completions.with_raw_response.create.return_value = raw
+            processor.governor = RateLimitGovernor(requests_per_minute=1000, tokens_per_minute=10**7)
+            metrics.WRITE_SECONDS.observe(0.5)     # recorded before the run, so not in its dump
+            processor.process_directory(input_dir, output_dir, processing_mode="postcard_poem")
+
+            with open(os.path.join(output_dir, "batch_results.metrics.json")) as f:
+                dumped = json.load(f)
+            latency = {tuple(sorted(s["labels"].items())): s["count"]
+                       for s in dumped["groq_request_seconds"]["series"]}
+            self.assertIn((("mode", "postcard_poem"), ("model", DEFAULT_MODEL), ("outcome", "ok")), latency)
+            self.assertEqual(sum(s["count"] for s in dumped["ocr_write_seconds"]["series"]), 1)
+            self.assertTrue(dumped["ocr_payload_bytes"]["series"])
+            self.assertIn("groq_retries_total", metrics.registry.render())
+        finally:
+            shutil.rmtree(input_dir)
+            shutil.rmtree(output_dir)
+
+    def test_metrics_endpoint_serves_text_format(self):
+        from web_app import app
+        app.config['TESTING'] = True
+        response = app.test_client().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        self.assertIn(b"# TYPE groq_request_seconds histogram", response.data)
+        self.assertIn(b"web_image_cache_hits_total", response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
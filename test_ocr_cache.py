@@ -0,0 +1,49 @@
+import unittest
+import os
+import shutil
+import tempfile
+from ocr_cache import OCRResultCache
+
+
+class TestOCRResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = OCRResultCache(os.path.join(self.tmp_dir, "cache.sqlite3"), max_bytes=100)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hit_and_miss_counters(self):
+        key = OCRResultCache.make_key("payload", "model", "poem", "prompt")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "model", "poem", "transcribed")
+        self.assertEqual(self.cache.get(key), "transcribed")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_key_depends_on_every_component(self):
+        base = OCRResultCache.make_key("payload", "model", "poem", "prompt")
+        self.assertNotEqual(base, OCRResultCache.make_key("payload2", "model", "poem", "prompt"))
+        self.assertNotEqual(base, OCRResultCache.make_key("payload", "model2", "poem", "prompt"))
+        self.assertNotEqual(base, OCRResultCache.make_key("payload", "model", "freeform", "prompt"))
+        self.assertNotEqual(base, OCRResultCache.make_key("payload", "model", "poem", "prompt2"))
+
+    def test_evicts_least_recently_used_over_budget(self):
+        for i in range(3):
+            self.cache.put(f"k{i}", "model", "poem", "x" * 40)
+        self.cache.get("k0")
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.get("k0"))
+        self.assertIsNone(self.cache.get("k1"))
+        self.assertLessEqual(self.cache.stats()["bytes"], 100)
+
+    def test_expired_entries_are_misses(self):
+        self.cache.max_age = -1
+        self.cache.put("k", "model", "poem", "text")
+        self.assertIsNone(self.cache.get("k"))
+
+
+if __name__ == '__main__':
+    unittest.main()
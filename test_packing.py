@@ -0,0 +1,27 @@
+import unittest
+from packing import PackSplitError, build_pack_messages, split_pack_response
+
+
+class TestPacking(unittest.TestCase):
+
+    def test_messages_number_each_image(self):
+        content = build_pack_messages("Transcribe.", ["AAA", "BBB"])[0]["content"]
+        self.assertIn("2 separate images", content[0]["text"])
+        self.assertEqual([part["type"] for part in content], ["text", "text", "image_url", "text", "image_url"])
+        self.assertTrue(content[4]["image_url"]["url"].endswith("BBB"))
+
+    def test_split_returns_sections_in_order(self):
+        response = "=== IMAGE 1 ===\nFirst poem\nConfidence: 8/10\n\n==== image 2 ====\nSecond\n"
+        self.assertEqual(split_pack_response(response, 2), ["First poem\nConfidence: 8/10", "Second"])
+
+    def test_split_rejects_missing_or_empty_sections(self):
+        with self.assertRaises(PackSplitError):
+            split_pack_response("=== IMAGE 1 ===\nOnly one", 2)
+        with self.assertRaises(PackSplitError):
+            split_pack_response("=== IMAGE 2 ===\nB\n=== IMAGE 1 ===\nA", 2)
+        with self.assertRaises(PackSplitError):
+            split_pack_response("=== IMAGE 1 ===\n\n=== IMAGE 2 ===\nB", 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
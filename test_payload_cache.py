@@ -0,0 +1,52 @@
+import unittest
+import os
+import shutil
+import tempfile
+from payload_cache import PayloadCache
+
+
+class TestPayloadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = PayloadCache(os.path.join(self.tmp_dir, "cache"), max_bytes=100)
+        self.image_path = os.path.join(self.tmp_dir, "image.jpg")
+        with open(self.image_path, "wb") as f:
+            f.write(b"original")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        key = PayloadCache.make_key(self.image_path, {"quality": 75})
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, b"encoded")
+        self.assertEqual(self.cache.get(key), b"encoded")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key_changes_with_file_and_settings(self):
+        key = PayloadCache.make_key(self.image_path, {"quality": 75})
+        self.assertNotEqual(key, PayloadCache.make_key(self.image_path, {"quality": 60}))
+        with open(self.image_path, "wb") as f:
+            f.write(b"replaced with more bytes")
+        self.assertNotEqual(key, PayloadCache.make_key(self.image_path, {"quality": 75}))
+
+    def test_evicts_least_recently_used(self):
+        for name in ("a", "b"):
+            self.cache.put(name, b"x" * 40)
+        old_time = os.path.getmtime(self.cache._path("b")) - 100
+        os.utime(self.cache._path("a"), (old_time, old_time))
+        self.cache.put("c", b"x" * 40)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("c"), b"x" * 40)
+        self.assertLessEqual(self.cache.stats()["bytes"], 100)
+
+
+    def test_overwrite_counts_only_the_new_size(self):
+        for _ in range(5):
+            self.cache.put("a", b"x" * 40)
+        self.assertEqual(self.cache.stats()["bytes"], 40)
+        self.assertEqual(self.cache.get("a"), b"x" * 40)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from payload_encoder import PayloadError, encode_image, payload_settings, looks_grayscale
+
+
+def _noisy(size, color=True):
+    """Hard-to-compress test image (random pixels)"""
+    if color:
+        return Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    return Image.frombytes("L", size, os.urandom(size[0] * size[1])).convert("RGB")
+
+
+class TestPayloadEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.settings = dict(payload_settings(), encoder="adaptive", max_size=1024, min_size=512,
+                             quality=75, target_bytes=60 * 1024, max_bytes=200 * 1024, grayscale="auto")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _save(self, img, name="scan.png"):
+        path = os.path.join(self.test_dir, name)
+        img.save(path)
+        return path
+
+    def test_invalid_settings_fall_back_to_defaults(self):
+        with patch.dict(os.environ, {'PAYLOAD_MAX_EDGE': '1024px', 'PAYLOAD_TARGET_KB': 'lots',
+                                     'PAYLOAD_ENCODER': 'smart'}):
+            with self.assertLogs(level='WARNING'):
+                settings = payload_settings()
+        self.assertEqual((settings["max_size"], settings["target_bytes"], settings["encoder"]),
+                         (1024, 250 * 1024, "fixed"))
+
+    def test_fixed_mode_matches_previous_output_size(self):
+        path = self._save(Image.new("RGB", (3000, 1500), "white"))
+        data, stats = encode_image(path, dict(self.settings, encoder="fixed"))
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (1024, 512))
+        self.assertEqual((stats["width"], stats["quality"], stats["grayscale"]), (1024, 75, False))
+
+    def test_adaptive_meets_byte_target(self):
+        path = self._save(_noisy((1200, 900)))
+        data, stats = encode_image(path, self.settings)
+        self.assertLessEqual(len(data), self.settings["target_bytes"])
+        self.assertEqual(stats["bytes"], len(data))
+        self.assertLess(stats["width"], 1200)
+
+    def test_grayscale_scans_are_sent_as_grayscale(self):
+        self.assertTrue(looks_grayscale(_noisy((64, 64), color=False)))
+        self.assertFalse(looks_grayscale(_noisy((64, 64))))
+        path = self._save(_noisy((400, 300), color=False))
+        data, stats = encode_image(path, self.settings)
+        self.assertTrue(stats["grayscale"])
+        self.assertEqual(Image.open(io.BytesIO(data)).mode, "L")
+
+    def test_hard_cap_replaces_raw_fallback(self):
+        path = self._save(_noisy((600, 600)))
+        with self.assertRaises(PayloadError):
+            encode_image(path, dict(self.settings, encoder="fixed", max_bytes=1024))
+        broken = os.path.join(self.test_dir, "broken.jpg")
+        with open(broken, "wb") as f:
+            f.write(b"not an image" * 1000)
+        with self.assertRaises(PayloadError):
+            encode_image(broken, self.settings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import time
+import threading
+import unittest
+from prefetch import Prefetcher
+
+
+def _drain(prefetcher, timeout=5):
+    """Wait for all queued prefetches to run (wait() would cancel the ones not started yet)"""
+    deadline = time.monotonic() + timeout
+    while prefetcher.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        prefetcher = Prefetcher(window=0)
+        prefetcher.prefetch('display', ['a.jpg'], lambda item: self.fail("should not run"))
+        self.assertFalse(prefetcher.enabled)
+
+    def test_stale_queued_work_is_cancelled(self):
+        prefetcher = Prefetcher(window=2, workers=1)
+        release = threading.Event()
+        done = []
+        prefetcher.prefetch('display', ['busy.jpg'], lambda item: release.wait(5))
+        prefetcher.prefetch('ocr', ['1.jpg', '2.jpg'], done.append, variant='model-a')
+        # Reviewer moved on and switched model: 1.jpg and the model-a work are no longer wanted
+        prefetcher.prefetch('ocr', ['2.jpg', '3.jpg'], done.append, variant='model-b')
+        release.set()
+        _drain(prefetcher)
+        self.assertEqual(done, ['2.jpg', '3.jpg'])
+        self.assertEqual(prefetcher.stats()['cancelled'], 2)
+
+    def test_wait_and_failures(self):
+        prefetcher = Prefetcher(window=1)
+        prefetcher.prefetch('ocr', ['bad.jpg'], lambda item: 1 / 0)
+        self.assertTrue(prefetcher.wait('ocr', 'bad.jpg', timeout=5))
+        self.assertFalse(prefetcher.wait('ocr', 'other.jpg'))
+        self.assertEqual(prefetcher.stats()['failed'], 1)
+
+
+    def test_wait_cancels_work_that_has_not_started(self):
+        prefetcher = Prefetcher(window=2, workers=1)
+        release = threading.Event()
+        done = []
+        prefetcher.prefetch('ocr', ['busy.jpg', 'next.jpg'], lambda item: release.wait(5) and done.append(item))
+        self.assertFalse(prefetcher.wait('ocr', 'next.jpg', timeout=5))
+        release.set()
+        self.assertTrue(prefetcher.wait('ocr', 'busy.jpg', timeout=5))
+        self.assertEqual(done, ['busy.jpg'])
+        self.assertEqual(prefetcher.stats()['cancelled'], 1)
+
+    def test_owners_do_not_cancel_each_other(self):
+        prefetcher = Prefetcher(window=2, workers=1)
+        release = threading.Event()
+        done = []
+        prefetcher.prefetch('display', ['busy.jpg'], lambda item: release.wait(5), owner='a')
+        prefetcher.prefetch('display', ['1.jpg'], done.append, owner='a')
+        prefetcher.prefetch('display', ['7.jpg'], done.append, owner='b')
+        release.set()
+        _drain(prefetcher)
+        self.assertEqual(sorted(done), ['1.jpg', '7.jpg'])
+        self.assertEqual(prefetcher.stats()['cancelled'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from processing_modes import ModeRegistry, CUSTOM_FALLBACK_PROMPT
+
+
+class TestModeRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.settings_path = os.path.join(self.test_dir, 'custom_poem_settings.json')
+        self.registry = ModeRegistry(self.settings_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write_settings(self, structure, mtime):
+        with open(self.settings_path, 'w') as f:
+            json.dump({'custom_poem': {'structure': structure, 'document_contains': ['Poem text'],
+                                       'prompt_template': 'Include {document_contains}; {structure}'}}, f)
+        os.utime(self.settings_path, (mtime, mtime))
+
+    def test_unknown_mode_raises(self):
+        with self.assertRaises(ValueError):
+            self.registry.get('nope')
+
+    def test_custom_prompt_reloads_only_when_file_changes(self):
+        self.assertEqual(self.registry.get('custom_poem').prompt, CUSTOM_FALLBACK_PROMPT)
+        self._write_settings('Haiku', 1000)
+        self.assertEqual(self.registry.get('custom_poem').prompt, 'Include Poem text; Haiku')
+        reloads = self.registry.reloads
+        self.registry.get('custom_poem')
+        self.assertEqual(self.registry.reloads, reloads)
+        self._write_settings('Sonnet', 2000)
+        self.assertEqual(self.registry.get('custom_poem').prompt, 'Include Poem text; Sonnet')
+
+    def test_save_custom_settings_is_live_and_persisted(self):
+        self.registry.save_custom_settings({'structure': 'Limerick', 'document_contains': ['Student name']})
+        self.assertIn('CUSTOM_STRUCTURE: Limerick', self.registry.get('custom_poem').prompt)
+        self.assertEqual(ModeRegistry(self.settings_path).custom_settings()['structure'], 'Limerick')
+        self.assertEqual([f for f in os.listdir(self.test_dir)], ['custom_poem_settings.json'])
+
+
+    def test_save_keeps_the_settings_file_mode(self):
+        self.registry.save_custom_settings({'structure': 'Haiku'})
+        self.assertEqual(os.stat(self.settings_path).st_mode & 0o777, 0o644)
+        os.chmod(self.settings_path, 0o664)
+        self.registry.save_custom_settings({'structure': 'Limerick'})
+        self.assertEqual(os.stat(self.settings_path).st_mode & 0o777, 0o664)
+
+if __name__ == '__main__':
+    unittest.main()
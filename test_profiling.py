@@ -0,0 +1,39 @@
+import time
+import unittest
+from profiling import RunProfiler, RunSummary, StageTimings
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_stage_records_wall_and_cpu(self):
+        timings = StageTimings()
+        with timings.stage("transcribe"):
+            time.sleep(0.02)
+        entry = timings.to_dict()["transcribe"]
+        self.assertGreaterEqual(entry["wall_ms"], 15)
+        self.assertLess(entry["cpu_ms"], entry["wall_ms"])     # sleeping is not CPU time
+
+    def test_summary_aggregates_stages_and_payloads(self):
+        summary = RunSummary()
+        summary.add({"payload": {"bytes": 100}, "timings": {"parse": {"wall_ms": 1.0, "cpu_ms": 1.0},
+                                                            "encode": {"wall_ms": 10.0}}})
+        summary.add({"payload": {"bytes": 300}, "timings": {"parse": {"wall_ms": 3.0, "cpu_ms": 2.0}}})
+        summary.add({"error": "RuntimeError: boom", "payload": None, "timings": {}})
+        data = summary.to_dict()
+        self.assertEqual((data["images"], data["failed"]), (3, 1))
+        self.assertEqual(data["payload_bytes"], {"total": 400, "mean": 200, "max": 300})
+        self.assertEqual(list(data["stages"]), ["encode", "parse"])
+        self.assertEqual(data["stages"]["parse"]["wall_ms_total"], 4.0)
+        self.assertEqual(data["stages"]["parse"]["cpu_ms_total"], 3.0)
+        self.assertIsNone(data["stages"]["encode"]["cpu_ms_total"])
+
+    def test_profiler_samples_every_nth_unit(self):
+        profiler = RunProfiler(every=2)
+        self.assertEqual([p for p in range(1, 6) if profiler.wants(p)], [1, 3, 5])
+        self.assertEqual(profiler.run(lambda: sum(range(100))), 4950)
+        self.assertEqual(profiler.sampled, 1)
+        self.assertFalse(RunProfiler().dump("/nonexistent/never-written.pstats"))
+
+
+if __name__ == '__main__':
+    unittest.main()
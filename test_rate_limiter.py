@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import httpx
+import groq
+from rate_limiter import RateLimitGovernor, parse_duration
+
+
+def _rate_limit_error(retry_after="2"):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return groq.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class TestRateLimitGovernor(unittest.TestCase):
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("7"), 7.0)
+        self.assertAlmostEqual(parse_duration("2m59.56s"), 179.56)
+        self.assertAlmostEqual(parse_duration("120ms"), 0.12)
+        self.assertIsNone(parse_duration("soon"))
+
+    def test_backoff_honors_retry_after(self):
+        governor = RateLimitGovernor(base_delay=0.01)
+        self.assertGreaterEqual(governor.backoff_delay(0, retry_after=3.0), 3.0)
+
+    @patch('rate_limiter.time.sleep')
+    def test_call_retries_rate_limit_then_succeeds(self, mock_sleep):
+        governor = RateLimitGovernor(requests_per_minute=1000, tokens_per_minute=10**6, base_delay=0.01)
+        raw = MagicMock()
+        raw.headers = {}
+        raw.parse.return_value.usage.total_tokens = 500
+        fn = MagicMock(side_effect=[_rate_limit_error("2"), raw])
+
+        completion = governor.call(fn, estimated_tokens=1000)
+
+        self.assertIs(completion, raw.parse.return_value)
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(governor.stats["rate_limited"], 1)
+        self.assertGreaterEqual(mock_sleep.call_args_list[0][0][0], 2.0)
+
+    @patch('rate_limiter.time.sleep')
+    def test_call_gives_up_after_max_retries(self, mock_sleep):
+        governor = RateLimitGovernor(max_retries=2, base_delay=0.01)
+        fn = MagicMock(side_effect=_rate_limit_error("0"))
+        with self.assertRaises(groq.RateLimitError):
+            governor.call(fn, estimated_tokens=10)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_exhausted_headers_block_until_reset(self):
+        governor = RateLimitGovernor()
+        governor.update_from_headers({"x-ratelimit-remaining-requests": "0",
+                                      "x-ratelimit-reset-requests": "5s"})
+        self.assertEqual(governor.requests.tokens, 0)
+        self.assertGreater(governor._blocked_until, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from response_parser import parse_response, tokenize
+
+
+ZIP_ODE_RESPONSE = """TRANSCRIPTION:
+Maria Lopez
+Coral Way K-8
+Name: Maria
+Sun on the bay
+
+STUDENT_NAME: Maria Lopez
+SCHOOL_NAME: Coral Way K-8
+ZIP_CODE: 33133
+
+POEM:
+Sun on the bay
+
+POEM_TITLE: Bay
+POEM_THEME: miami
+POEM_LANGUAGE: English
+Confidence: 9/10"""
+
+
+class TestResponseParser(unittest.TestCase):
+
+    def test_zip_ode_fields_and_blocks(self):
+        record = parse_response(ZIP_ODE_RESPONSE, "zip_ode_explain")
+        self.assertTrue(record.structured)
+        self.assertEqual(record.student_name, "Maria Lopez")
+        self.assertEqual(record.zip_code, "33133")
+        self.assertEqual(record.block("TRANSCRIPTION"), "Maria Lopez\nCoral Way K-8\nName: Maria\nSun on the bay")
+        self.assertEqual(record.poem_lines, ["Sun on the bay"])
+        self.assertEqual(record.confidence, "Confidence: 9/10")
+        self.assertNotIn("Confidence", record.text)
+        self.assertEqual(record.to_zip_ode_dict()["overall_ok"], "False")
+
+    def test_mode_specific_keys_are_kept(self):
+        record = parse_response("Jane Smith\nDear Miami,\nPOEM_TITLE: Hello\nPOSTCARD_TYPE: travel\nConfidence: 7/10",
+                                "postcard_poem")
+        self.assertFalse(record.structured)
+        self.assertEqual(record.student_name, "Jane Smith")
+        self.assertEqual(record.poem_title, "Hello")
+        self.assertEqual(record.fields["POSTCARD_TYPE"], "travel")
+
+    def test_named_keys_override_header_guess(self):
+        record = parse_response("Customer Survey\n[✓] Yes\nPARTICIPANT_NAME: Ana Diaz\nFORM_TITLE: Feedback", "survey_form")
+        self.assertEqual(record.student_name, "Ana Diaz")
+        self.assertEqual(record.fields["FORM_TITLE"], "Feedback")
+
+    def test_missing_structured_fields_default_to_unknown(self):
+        record = tokenize("POEM_TITLE:\n", structured=True)
+        self.assertEqual(record.student_name, "Unknown")
+        self.assertEqual(record.poem_title, "")
+        self.assertEqual(record.to_zip_ode_dict()["overall_ok"], "Unknown")
+
+    def test_poem_line_starting_with_a_known_key_word_stays_in_the_block(self):
+        record = tokenize("TRANSCRIPTION:\nline one\nLanguage: the words we keep\nline three\nZIP_ODE_EXPLANATION: ok",
+                          structured=True)
+        self.assertEqual(record.block("TRANSCRIPTION"), "line one\nLanguage: the words we keep\nline three")
+        self.assertEqual(record.fields["ZIP_ODE_EXPLANATION"], "ok")
+        self.assertNotIn("LANGUAGE", record.fields)
+
+
+    def test_confidence_line_ends_the_poem_block(self):
+        record = parse_response("STUDENT_NAME: Ana\nZIP_CODE: 33133\nPOEM:\nSun on bay\nWaves roll in\nSalt\n"
+                                "Palms sway slow\nHome at last\nConfidence: 8/10", "zip_ode_explain")
+        self.assertEqual(len(record.poem_lines), 5)
+        self.assertEqual(record.to_zip_ode_dict()["overall_ok"], "True")
+
+    def test_lower_case_known_keys_end_the_transcription_block(self):
+        record = parse_response("TRANSCRIPTION:\nSun on the bay\nstudent_name: Maria Lopez\nzip_code: 33133\n"
+                                "poem:\nSun on the bay", "zip_ode_explain")
+        self.assertEqual(record.block("TRANSCRIPTION"), "Sun on the bay")
+        self.assertEqual(record.student_name, "Maria Lopez")
+        self.assertEqual(record.zip_code, "33133")
+        self.assertEqual(record.poem_lines, ["Sun on the bay"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from flask import Flask, session
+from session_store import SessionStore, ServerSessionInterface
+
+
+def _app():
+    app = Flask(__name__)
+    app.secret_key = "test-secret"
+    app.session_interface = ServerSessionInterface()
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['cursor'] = value
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return session.get('cursor', '')
+
+    @app.route('/regenerate')
+    def regenerate():
+        session.regenerate()
+        return 'ok'
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "sessions.sqlite3")
+        self.env = patch.dict(os.environ, {'SESSION_STORE_PATH': self.path})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_store_round_trip_and_expiry(self):
+        store = SessionStore(self.path, max_age=60)
+        store.save("abc", {"cursor": "scan_001.jpg"})
+        self.assertEqual(store.load("abc"), {"cursor": "scan_001.jpg"})
+        expired = SessionStore(self.path, max_age=-1)
+        expired.save("old", {"cursor": "x.jpg"})
+        self.assertIsNone(expired.load("old"))
+        store.delete("abc")
+        self.assertIsNone(store.load("abc"))
+
+    def test_cookie_carries_only_a_signed_id(self):
+        client = _app().test_client()
+        client.get('/set/' + 'x' * 3000)
+        cookie = client.get_cookie('session')
+        self.assertLess(len(cookie.value), 100)
+        self.assertNotIn('xxx', cookie.value)
+        self.assertEqual(len(client.get('/get').get_data(as_text=True)), 3000)
+
+    def test_tampered_cookie_starts_a_fresh_session(self):
+        client = _app().test_client()
+        client.get('/set/first')
+        client.set_cookie('session', client.get_cookie('session').value + 'x')
+        self.assertEqual(client.get('/get').get_data(as_text=True), '')
+
+    def test_unmodified_requests_do_not_write_and_cleared_sessions_are_deleted(self):
+        app = _app()
+        client = app.test_client()
+        client.get('/set/a')
+        client.get('/get')
+        self.assertEqual(app.session_interface.stats()["writes"], 1)
+        client.get('/clear')
+        self.assertEqual(app.session_interface.stats()["sessions"], 0)
+        self.assertIsNone(client.get_cookie('session'))
+
+
+    def test_regenerate_moves_the_data_to_a_new_id_and_drops_the_old_row(self):
+        app = _app()
+        client = app.test_client()
+        client.get('/set/a')
+        old_cookie = client.get_cookie('session').value
+        client.get('/regenerate')
+        self.assertNotEqual(client.get_cookie('session').value, old_cookie)
+        self.assertEqual(client.get('/get').get_data(as_text=True), 'a')
+        self.assertEqual(app.session_interface.stats()["sessions"], 1)
+        client.set_cookie('session', old_cookie)
+        self.assertEqual(client.get('/get').get_data(as_text=True), '')
+
+if __name__ == '__main__':
+    unittest.main()
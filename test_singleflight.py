@@ -0,0 +1,71 @@
+import time
+import threading
+import unittest
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run_concurrently(self, flights, key, fn, count):
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        started = threading.Event()
+        calls = []
+
+        def transcribe():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "poem text"
+
+        threads, results, errors = self._run_concurrently(flights, "key", transcribe, 1)
+        started.wait(5)
+        more, more_results, _ = self._run_concurrently(flights, "key", transcribe, 2)
+        while flights.stats()["coalesced"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads + more:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results + more_results, ["poem text"] * 3)
+        self.assertEqual(flights.stats(), {"calls": 1, "coalesced": 2, "duplicated": 1, "in_flight": 0})
+
+        # Finished flights are forgotten: the next request runs again
+        flights.do("key", transcribe)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_reach_every_waiter(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError("rate limited")
+
+        threads, _, errors = self._run_concurrently(flights, "key", fail, 3)
+        while flights.stats()["coalesced"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(str(e) == "rate limited" for e in errors))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import shutil
+import tempfile
+from upload_index import UploadIndex
+
+
+class TestUploadIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.index = UploadIndex(self.upload_dir, rescan_interval=3600)
+
+    def tearDown(self):
+        shutil.rmtree(self.upload_dir)
+
+    def _write(self, name, data=b"data"):
+        with open(os.path.join(self.upload_dir, name), "wb") as f:
+            f.write(data)
+
+    def test_lists_sorted_non_empty_images(self):
+        self._write("b.jpg")
+        self._write("a.png")
+        self._write("empty.jpg", b"")
+        self._write("notes.txt")
+        self._write("packet.pdf")
+        self.assertEqual([os.path.basename(p) for p in self.index.images()], ["a.png", "b.jpg"])
+        self.assertEqual([os.path.basename(p) for p in self.index.pdfs()], ["packet.pdf"])
+
+    def test_unchanged_directory_is_not_rescanned(self):
+        self._write("a.jpg")
+        self.index.images()
+        self.index.images()
+        self.assertEqual(self.index.scans, 1)
+
+    def test_picks_up_new_files_and_filled_uploads(self):
+        self._write("a.jpg")
+        self._write("late.jpg", b"")
+        self.assertEqual(len(self.index.images()), 1)
+        self._write("late.jpg")
+        self.index.invalidate()
+        self._write("c.jpg")
+        self.assertEqual([os.path.basename(p) for p in self.index.images()], ["a.jpg", "c.jpg", "late.jpg"])
+
+
+if __name__ == '__main__':
+    unittest.main()
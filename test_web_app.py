@@ -2,9 +2,15 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import json
-from web_app import app, SessionManager
+from web_app import app, SessionManager, extract_images_from_pdf
 from student_info import StudentInfo
 import io
+import shutil
+import tempfile
+from PIL import Image
+
+# Keep the server-side session database out of the working tree
+os.environ.setdefault('SESSION_STORE_PATH', os.path.join(tempfile.mkdtemp(), 'sessions.sqlite3'))
 
 class TestWebApp(unittest.TestCase):
 
@@ -47,5 +53,137 @@ class TestWebApp(unittest.TestCase):
         self.assertIn('text', response_data)
         self.assertEqual(response_data['text'], 'Test converted text')
         
+    def test_image_endpoint_conditional_get(self):
+        upload_dir = tempfile.mkdtemp()
+        try:
+            Image.new("RGB", (3000, 1500), "white").save(os.path.join(upload_dir, "scan.jpg"))
+            with patch.dict(os.environ, {'UPLOAD_DIRECTORY': upload_dir}):
+                response = self.client.get('/image/scan.jpg?size=display')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, 'image/jpeg')
+                self.assertEqual(Image.open(io.BytesIO(response.data)).size, (1600, 800))
+                etag = response.headers['ETag']
+                self.assertIsNotNone(response.headers.get('Last-Modified'))
+
+                cached = self.client.get('/image/scan.jpg?size=display', headers={'If-None-Match': etag})
+                self.assertEqual(cached.status_code, 304)
+
+                self.assertEqual(self.client.get('/image/missing.jpg').status_code, 404)
+        finally:
+            shutil.rmtree(upload_dir)
+
+    def test_image_endpoint_serves_names_with_spaces_and_accents(self):
+        upload_dir = tempfile.mkdtemp()
+        try:
+            Image.new("RGB", (64, 64), "white").save(os.path.join(upload_dir, "My Scan poème.jpg"))
+            Image.new("RGB", (64, 64), "white").save(os.path.join(os.path.dirname(upload_dir), "outside.jpg"))
+            with patch.dict(os.environ, {'UPLOAD_DIRECTORY': upload_dir}):
+                info = json.loads(self.client.get('/get_image_info').data)
+                self.assertEqual(self.client.get(info['original_url']).status_code, 200)
+                self.assertEqual(self.client.get(info['image_url']).status_code, 200)
+                self.assertEqual(self.client.get('/image/..%2Foutside.jpg').status_code, 404)
+        finally:
+            shutil.rmtree(upload_dir)
+            os.remove(os.path.join(os.path.dirname(upload_dir), "outside.jpg"))
+
+    @patch('web_app.convert_from_path')
+    @patch('web_app.pdfinfo_from_path')
+    def test_extract_images_from_pdf_renders_pages_one_at_a_time(self, mock_pdfinfo, mock_convert):
+        mock_pdfinfo.return_value = {'Pages': 3}
+        mock_convert.side_effect = lambda path, dpi, first_page, last_page: [Image.new("RGB", (20, 30), "white")]
+        work_dir = tempfile.mkdtemp()
+        upload_dir = os.path.join(work_dir, 'uploads')
+        converted_dir = os.path.join(work_dir, 'converted')
+        os.makedirs(upload_dir)
+        pdf_path = os.path.join(upload_dir, 'packet.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        progress = []
+        try:
+            with patch.dict(os.environ, {'UPLOAD_DIRECTORY': upload_dir, 'CONVERTED_IMAGES_DIRECTORY': converted_dir}):
+                pages = extract_images_from_pdf(pdf_path, progress_callback=lambda n, total, path: progress.append((n, total)))
+            self.assertEqual([os.path.basename(p) for p in pages],
+                             ['packet_page_1.jpg', 'packet_page_2.jpg', 'packet_page_3.jpg'])
+            self.assertEqual(sorted(progress), [(1, 3), (2, 3), (3, 3)])
+            self.assertTrue(all(call.kwargs['first_page'] == call.kwargs['last_page'] for call in mock_convert.call_args_list))
+            self.assertFalse(os.path.exists(pdf_path))
+            self.assertTrue(os.path.exists(os.path.join(converted_dir, 'packet.pdf')))
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch('batch_processor.BatchImageProcessor')
+    def test_batch_process_runs_as_background_job(self, mock_processor_class):
+        def fake_process_directory(*args, progress_callback=None, **kwargs):
+            progress_callback(0, 1, None)
+            progress_callback(1, 1, {'filename': 'a.jpg', 'saved_as': 'A.txt'})
+            return []
+        mock_processor_class.return_value.process_directory.side_effect = fake_process_directory
+
+        response = self.client.post('/batch_process', json={'api_key': 'test_key'})
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['job_id']
+
+        events = self.client.get(f'/batch_jobs/{job_id}/events').get_data(as_text=True)
+        self.assertIn('event: progress', events)
+        self.assertIn('"saved_as": "A.txt"', events)
+
+        status = json.loads(self.client.get(f'/batch_jobs/{job_id}').data)
+        self.assertEqual((status['status'], status['done'], status['total']), ('completed', 1, 1))
+        results = json.loads(self.client.get(f'/batch_jobs/{job_id}/results').data)['results']
+        self.assertEqual(results, [{'filename': 'a.jpg', 'saved_as': 'A.txt'}])
+        self.assertEqual(self.client.get('/batch_jobs/unknown').status_code, 404)
+
+    @patch.dict(os.environ, {'BATCH_WORKERS': '4'})
+    @patch('batch_processor.BatchImageProcessor')
+    def test_batch_process_clamps_workers(self, mock_processor_class):
+        used = []
+        mock_processor_class.return_value.process_directory.side_effect = \
+            lambda *args, max_workers=None, **kwargs: used.append(max_workers) or []
+        for requested in (10000, -3, 2):
+            response = self.client.post('/batch_process', json={'api_key': 'test_key', 'workers': requested})
+            self.client.get(f"/batch_jobs/{json.loads(response.data)['job_id']}/events").get_data()
+        self.assertEqual(used, [4, 1, 2])
+        response = self.client.post('/batch_process', json={'api_key': 'test_key', 'workers': 'lots'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_review_queue_is_a_cursor_into_the_upload_index(self):
+        upload_dir = tempfile.mkdtemp()
+        try:
+            for name in ("a.jpg", "b.jpg", "c.jpg"):
+                Image.new("RGB", (32, 32), "white").save(os.path.join(upload_dir, name))
+            with patch.dict(os.environ, {'UPLOAD_DIRECTORY': upload_dir}):
+                self.client.get('/')
+                info = json.loads(self.client.post('/navigate', json={'direction': 'next'}).data)
+                self.assertEqual((info['index'], info['total']), (2, 3))
+                self.assertLess(len(self.client.get_cookie('session').value), 100)
+
+                # The image on screen is moved away: the cursor lands on the one after it
+                os.remove(os.path.join(upload_dir, "b.jpg"))
+                info = json.loads(self.client.get('/get_image_info').data)
+                self.assertEqual((info['index'], info['total']), (2, 2))
+                self.assertIn('c.jpg', info['original_url'])
+        finally:
+            shutil.rmtree(upload_dir)
+
+    @patch.dict(os.environ, {'APP_PASSWORD': 'secret'})
+    def test_login_and_logout_issue_a_new_session_id(self):
+        with self.client.session_transaction() as sess:
+            sess['current_image'] = 'scan_001.jpg'
+        planted = self.client.get_cookie('session').value
+        response = self.client.post('/login', data={'password': 'secret'})
+        self.assertEqual(response.status_code, 302)
+        logged_in = self.client.get_cookie('session').value
+        self.assertNotEqual(logged_in, planted)
+        with self.client.session_transaction() as sess:
+            self.assertTrue(sess['authenticated'])
+            self.assertEqual(sess['current_image'], 'scan_001.jpg')
+        # The pre-login ID no longer opens the session
+        self.client.set_cookie('session', planted)
+        with self.client.session_transaction() as sess:
+            self.assertNotIn('authenticated', sess)
+        self.client.set_cookie('session', logged_in)
+        self.client.get('/logout')
+        self.assertNotEqual(self.client.get_cookie('session').value, logged_in)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import logging
+
+IMAGE_FORMATS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.heic', '.heif')
+
+
+class UploadIndex:
+    """Maintained listing of the upload directory.
+
+    Listing queries return a cached snapshot. The directory is only rescanned
+    (with ``os.scandir``) when its mtime changes, or every ``rescan_interval``
+    seconds as a safety net for bind mounts that don't propagate directory
+    mtimes reliably. Files that were still empty at the last scan are
+    re-checked individually, so a half-written upload shows up once it has
+    content. PDFs are reported separately and never extracted here.
+    """
+
+    def __init__(self, directory, rescan_interval=10.0):
+        self.directory = directory
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._scanned_at = 0.0
+        self._files = {}          # name -> (mtime_ns, size) for supported images
+        self._images = ()         # sorted paths of non-empty images (immutable snapshot)
+        self._empty = set()       # names of images that were 0 bytes at scan time
+        self._pdfs = []
+        self.scans = 0
+
+    def _stale(self):
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return True, None
+        expired = time.monotonic() - self._scanned_at > self.rescan_interval
+        return dir_mtime != self._dir_mtime or expired, dir_mtime
+
+    def _scan(self, dir_mtime):
+        files, empty, pdfs = {}, set(), []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                name = entry.name
+                lower = name.lower()
+                try:
+                    if lower.endswith(IMAGE_FORMATS):
+                        st = entry.stat()
+                        files[name] = (st.st_mtime_ns, st.st_size)
+                        if st.st_size == 0:
+                            empty.add(name)
+                    elif lower.endswith('.pdf'):
+                        pdfs.append(entry.path)
+                except (OSError, PermissionError) as e:
+                    logging.error(f"Cannot access file {name}: {e}")
+                    logging.error(f"Check Docker file sharing permissions for: {self.directory}")
+        added = files.keys() - self._files.keys()
+        removed = self._files.keys() - files.keys()
+        if added or removed:
+            logging.debug(f"Upload index: +{len(added)} -{len(removed)} files")
+        self._files = files
+        self._empty = empty
+        self._pdfs = sorted(pdfs)
+        self._images = tuple(os.path.join(self.directory, name) for name in sorted(files) if name not in empty)
+        self._dir_mtime = dir_mtime
+        self._scanned_at = time.monotonic()
+        self.scans += 1
+
+    def _recheck_empty(self):
+        filled = []
+        for name in self._empty:
+            try:
+                if os.path.getsize(os.path.join(self.directory, name)) > 0:
+                    filled.append(name)
+            except OSError:
+                continue
+        if filled:
+            self._empty.difference_update(filled)
+            self._images = tuple(os.path.join(self.directory, name) for name in sorted(self._files)
+                                 if name not in self._empty)
+
+    def refresh(self, force=False):
+        """Bring the snapshot up to date if the directory changed (or force a rescan)"""
+        with self._lock:
+            stale, dir_mtime = self._stale()
+            if dir_mtime is None:
+                raise FileNotFoundError(f"Upload directory not found: {self.directory}")
+            if force or stale:
+                self._scan(dir_mtime)
+            elif self._empty:
+                self._recheck_empty()
+
+    def images(self):
+        """Paths of non-empty supported images, sorted by filename (a shared, immutable tuple)"""
+        self.refresh()
+        return self._images
+
+    def pdfs(self):
+        """PDFs waiting in the upload directory (extraction happens elsewhere)"""
+        self.refresh()
+        with self._lock:
+            return list(self._pdfs)
+
+    def invalidate(self):
+        """Force a rescan on the next query (e.g. after this process changed the directory)"""
+        with self._lock:
+            self._dir_mtime = None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_upload_index(directory):
+    """Shared index for one upload directory (paths are joined onto `directory` as given)"""
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = UploadIndex(directory, rescan_interval=float(os.environ.get('UPLOAD_RESCAN_SECONDS', '10')))
+            _indexes[directory] = index
+        return index
@@ -1,21 +1,33 @@
 from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
-import base64
 import os
 from utils import _filename_clean_pattern
-from groq import Groq
+from groq_clients import registry as groq_clients
+from processing_modes import registry as processing_modes_registry
+from response_parser import parse_response
 import json
-from datetime import datetime
 from werkzeug.utils import secure_filename
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPageCountError, PDFInfoNotInstalledError
 import shutil
-from functools import wraps, lru_cache
+from functools import wraps
 from PIL import Image
 import pillow_heif
-import re
 import logging
 import io
-from student_info import StudentInfo
+import mimetypes
+from image_cache import ImageCache
+from upload_index import get_upload_index
+from batch_jobs import job_manager
+from singleflight import ocr_flights
+from hedging import get_hedge_policy
+from prefetch import Prefetcher, prefetch_window, prefetch_ocr_enabled
+import metrics
+import secrets
+import session_store
+import bisect
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -23,6 +35,8 @@ app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB limit
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300  # 5 minutes cache
+# Session data lives server-side (SQLite); the cookie only carries a signed session ID
+sessions = session_store.init_app(app)
 
 # Simple authentication decorator
 def require_auth(f):
@@ -36,24 +50,55 @@ def require_auth(f):
 
 # Session management
 class SessionManager:
+    """Review queue state for the current session.
+
+    The queue is the shared upload index rather than a per-session copy of
+    the listing; the session only stores a cursor (the filename on screen).
+    If that file leaves the queue (saved, moved), the cursor resolves to the
+    image that took its place in sort order.
+    """
     @staticmethod
     def get_current_images():
-        return session.get('current_images', [])
+        directory = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
+        try:
+            return get_upload_index(directory).images()
+        except OSError:
+            return ()
     
     @staticmethod
     def set_current_images(images):
-        session['current_images'] = images
+        # The listing comes from the upload index; only drop state left by older cookie sessions
+        session.pop('current_images', None)
     
     @staticmethod
     def get_current_index():
-        return session.get('current_index', 0)
+        cursor = session.get('current_image')
+        images = SessionManager.get_current_images()
+        if not cursor or not images:
+            return 0
+        directory = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
+        # Index paths share the directory prefix, so they sort by filename
+        return min(bisect.bisect_left(images, os.path.join(directory, cursor)), len(images) - 1)
     
     @staticmethod
     def set_current_index(index):
-        session['current_index'] = index
+        images = SessionManager.get_current_images()
+        session.pop('current_index', None)
+        if 0 <= index < len(images):
+            session['current_image'] = os.path.basename(images[index])
+        else:
+            session.pop('current_image', None)
+
+def extract_images_from_pdf(pdf_path, first_page=1, last_page=None, progress_callback=None, move_when_done=True):
+    """Rasterize PDF pages to JPEGs in the upload directory, then move the PDF to the processed directory.
 
-def extract_images_from_pdf(pdf_path):
-    """Extract images from PDF and save them, then move PDF to processed directory"""
+    Pages are rendered one at a time (never the whole document in memory)
+    across a bounded pool of PDF_RENDER_WORKERS threads, each driving its own
+    pdftoppm process. Lower pages are submitted first, so they land in the
+    upload directory (and the review queue) while the rest are still
+    rendering. progress_callback(page_no, total_pages, image_path) is called
+    as each page is written.
+    """
     try:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
@@ -61,25 +106,53 @@ def extract_images_from_pdf(pdf_path):
         if os.path.getsize(pdf_path) == 0:
             raise ValueError("PDF file is empty")
         
-        pages = convert_from_path(pdf_path, dpi=150)
-        if not pages:
+        try:
+            page_count = int(pdfinfo_from_path(pdf_path)["Pages"])
+        except (PDFPageCountError, PDFInfoNotInstalledError, KeyError) as info_error:
+            raise ValueError(f"Cannot read PDF page count: {info_error}") from info_error
+        if page_count < 1:
             raise ValueError("No pages found in PDF")
+        last_page = min(last_page or page_count, page_count)
         
-        extracted_files = []
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
         upload_dir = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
         
-        for i, page in enumerate(pages):
-            try:
-                image_path = os.path.join(upload_dir, f"{base_name}_page_{i+1}.png")
-                page.save(image_path, 'PNG')
-                extracted_files.append(image_path)
-            except (IOError, OSError) as page_error:
-                logging.error(f"Error saving page {i+1}: {page_error}")
-                continue
+        def render_page(page_no):
+            with metrics.PDF_RENDER_SECONDS.time():
+                pages = convert_from_path(pdf_path, dpi=150, first_page=page_no, last_page=page_no)
+                if not pages:
+                    raise ValueError(f"Page {page_no} rendered no image")
+                page = pages[0]
+                try:
+                    image_path = os.path.join(upload_dir, f"{base_name}_page_{page_no}.jpg")
+                    page.convert('RGB').save(image_path, 'JPEG', quality=85, optimize=True)
+                finally:
+                    page.close()
+            return image_path
+        
+        extracted_files = {}
+        workers = max(1, int(os.environ.get('PDF_RENDER_WORKERS', '2')))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-page") as executor:
+            futures = {executor.submit(render_page, page_no): page_no
+                       for page_no in range(first_page, last_page + 1)}
+            for future in as_completed(futures):
+                page_no = futures[future]
+                try:
+                    image_path = future.result()
+                except Exception as page_error:
+                    logging.error(f"Error saving page {page_no}: {page_error}")
+                    continue
+                extracted_files[page_no] = image_path
+                logging.info(f"PDF {base_name}: page {page_no}/{page_count} ready")
+                if progress_callback:
+                    progress_callback(page_no, page_count, image_path)
+        extracted_files = [extracted_files[n] for n in sorted(extracted_files)]
+        
+        # Nothing left to render (e.g. a 1-page PDF whose first page was done earlier)
+        all_pages_done = extracted_files or first_page > page_count
         
         # Move PDF to processed directory after successful extraction
-        if extracted_files:
+        if move_when_done and all_pages_done:
             try:
                 processed_dir = os.environ.get('CONVERTED_IMAGES_DIRECTORY', '/app/O-Ocr/converted_images')
                 os.makedirs(processed_dir, exist_ok=True)
@@ -107,10 +180,60 @@ def extract_images_from_pdf(pdf_path):
         logging.error(f"Error extracting PDF {pdf_path}: {e}")
         return []
 
+# PDFs are rasterized off the request path; pages join the review queue as they are written
+_pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf")
+_pdfs_scheduled = set()
+_pdfs_failed = set()      # (path, mtime_ns) of PDFs that produced no pages, not retried until changed
+_pdf_progress = {}        # PDF filename -> {'pages_done', 'pages_total', 'status'}
+_pdfs_lock = threading.Lock()
+
+def _record_pdf_page(pdf_path):
+    def on_page(page_no, total_pages, image_path):
+        with _pdfs_lock:
+            progress = _pdf_progress.setdefault(os.path.basename(pdf_path),
+                                                {'pages_done': 0, 'pages_total': total_pages, 'status': 'rendering'})
+            progress['pages_done'] += 1
+            progress['pages_total'] = total_pages
+    return on_page
+
+def _extract_pdf_in_background(pdf_path, first_page=1):
+    try:
+        mtime_ns = os.stat(pdf_path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    extracted = []
+    try:
+        extracted = extract_images_from_pdf(pdf_path, first_page=first_page,
+                                            progress_callback=_record_pdf_page(pdf_path))
+    finally:
+        with _pdfs_lock:
+            _pdfs_scheduled.discard(pdf_path)
+            progress = _pdf_progress.setdefault(os.path.basename(pdf_path),
+                                                {'pages_done': 0, 'pages_total': None, 'status': 'rendering'})
+            if extracted or not os.path.exists(pdf_path):
+                progress['status'] = 'done'
+            else:
+                progress['status'] = 'failed'
+                _pdfs_failed.add((pdf_path, mtime_ns))
+
+def schedule_pdf_extraction(pdf_paths, first_page=1):
+    """Queue PDFs for background page extraction (each at most once at a time)"""
+    for pdf_path in pdf_paths:
+        try:
+            mtime_ns = os.stat(pdf_path).st_mtime_ns
+        except OSError:
+            continue
+        with _pdfs_lock:
+            if pdf_path in _pdfs_scheduled or (pdf_path, mtime_ns) in _pdfs_failed:
+                continue
+            _pdfs_scheduled.add(pdf_path)
+            _pdf_progress[os.path.basename(pdf_path)] = {'pages_done': 0, 'pages_total': None, 'status': 'queued'}
+        logging.info(f"Queued PDF for background extraction: {pdf_path}")
+        _pdf_executor.submit(_extract_pdf_in_background, pdf_path, first_page)
+
 def get_image_files():
-    """Get all image files from the directory"""
+    """Get all image files from the directory (served from the maintained upload index)"""
     directory = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
-    supported_formats = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.heic', '.heif')
     
     try:
         if not os.path.exists(directory):
@@ -118,22 +241,11 @@ def get_image_files():
             os.makedirs(directory)
             return []
         
-        image_files = []
-        for file in os.listdir(directory):
-            file_path = os.path.join(directory, file)
-            
-            try:
-                if file.lower().endswith(supported_formats):
-                    if os.path.getsize(file_path) > 0:
-                        image_files.append(file_path)
-                elif file.lower().endswith('.pdf'):
-                    extracted = extract_images_from_pdf(file_path)
-                    image_files.extend(extracted)
-            except (OSError, PermissionError) as e:
-                logging.error(f"Cannot access file {file}: {e}")
-                logging.error(f"Check Docker file sharing permissions for: {directory}")
-                continue
-        
+        index = get_upload_index(directory)
+        image_files = index.images()
+        pending_pdfs = index.pdfs()
+        if pending_pdfs:
+            schedule_pdf_extraction(pending_pdfs)
         return image_files
     except PermissionError as e:
         logging.error(f"Permission denied accessing directory {directory}: {e}")
@@ -143,20 +255,91 @@ def get_image_files():
         logging.error(f"Cannot read directory {directory}: {e}")
         return []
 
-@lru_cache(maxsize=32)  # Cache up to 32 images
-def image_to_base64(image_path):
-    """Convert image to base64 string"""
-    try:
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
+# Shared, byte-bounded cache for every image-reading path in the web app
+image_cache = ImageCache(max_bytes=int(os.environ.get('WEB_IMAGE_CACHE_MB', '64')) * 1024 * 1024)
 
-        if os.path.getsize(image_path) == 0:
-            raise ValueError("Image file is empty")
+# Display renditions served by /image/<id>?size=..., as max edge in pixels
+IMAGE_RENDITIONS = {'display': 1600, 'thumb': 256}
 
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except (IOError, OSError) as e:
-        raise IOError(f"Error converting image to base64: {e}") from e
+def _read_bytes(image_path):
+    with open(image_path, "rb") as image_file:
+        return image_file.read()
+
+def _render(max_edge):
+    """Loader producing a JPEG rendition no larger than max_edge on its longest side"""
+    def load(image_path):
+        with Image.open(image_path) as img:
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG', quality=85, optimize=True)
+            return buffer.getvalue()
+    return load
+
+def image_etag(image_path, size='original'):
+    """Strong validator for one rendition of an image file"""
+    st = os.stat(image_path)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}-{size}"
+
+def image_info(image_path, index, total):
+    """Metadata + URLs for one image in the review queue (no image bytes)"""
+    filename = os.path.basename(image_path)
+    version = os.stat(image_path).st_mtime_ns
+    return {
+        'filename': filename,
+        'image_url': url_for('get_image', image_id=filename, size='display', v=version),
+        'thumbnail_url': url_for('get_image', image_id=filename, size='thumb', v=version),
+        'original_url': url_for('get_image', image_id=filename, v=version),
+        'index': index,
+        'total': total
+    }
+
+# Opt-in background preparation of the next images in the review queue
+prefetcher = Prefetcher(window=prefetch_window(), workers=int(os.environ.get('PREFETCH_WORKERS', '2')))
+
+def _warm_display(image_path):
+    image_cache.get_or_load(image_path, _render(IMAGE_RENDITIONS['display']), variant='display')
+
+def _prefetch_owner():
+    """Per-session token so each reviewer's prefetch window only replaces their own"""
+    return session.setdefault('prefetch_owner', secrets.token_hex(8))
+
+def schedule_prefetch(current_images, current_index, api_key=None, model=None, processing_mode=None):
+    """Prepare display renditions for the next images, and with PREFETCH_OCR their OCR results too"""
+    if not prefetcher.enabled or not current_images:
+        return
+    window = prefetcher.window
+    owner = _prefetch_owner()
+    prefetcher.prefetch('display', list(current_images[current_index + 1:current_index + 1 + window]), _warm_display,
+                        owner=owner)
+    
+    if not (api_key and model and processing_mode and prefetch_ocr_enabled()):
+        return
+    from batch_processor import BatchImageProcessor
+    processor = BatchImageProcessor(os.environ.get('UPLOAD_DIRECTORY', os.getcwd()), api_key,
+                                    cache_directory=os.environ.get('OUTPUT_DIRECTORY', os.getcwd()))
+    # Speculative OCR is only useful if Convert can pick the result up from the OCR cache
+    if processor.result_cache is None:
+        return
+    
+    def transcribe(image_path):
+        processor.request_transcription(image_path, model, processing_mode)
+    
+    # The image on screen first, then the ones after it
+    prefetcher.prefetch('ocr', list(current_images[current_index:current_index + 1 + window]), transcribe,
+                        variant=(model, processing_mode), owner=owner)
+
+def _prefetch_options(req_json):
+    """api_key/model/processing_mode from a request body, for OCR prefetch"""
+    req_json = req_json or {}
+    return {'api_key': req_json.get('api_key'), 'model': req_json.get('model'),
+            'processing_mode': req_json.get('processing_mode')}
+
+def _regenerate_session():
+    """New session ID on login/logout so a planted or leaked one is useless (server-side sessions only)"""
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -164,6 +347,7 @@ def login():
         password = request.form.get('password')
         # Simple password check - use proper authentication in production
         if password == os.environ.get('APP_PASSWORD', 'admin123'):
+            _regenerate_session()
             session['authenticated'] = True
             return redirect(url_for('index'))
         else:
@@ -173,12 +357,51 @@ def login():
 @app.route('/logout')
 def logout():
     session.pop('authenticated', None)
+    _regenerate_session()
     return redirect(url_for('login'))
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'healthy'}), 200
 
+def _web_metrics():
+    """Export the web-only caches and pools in /metrics"""
+    images, clients, prefetch = image_cache.stats(), groq_clients.stats(), prefetcher.stats()
+    return [
+        ("web_image_cache_hits_total", "counter", "Rendered image cache hits", None, images["hits"]),
+        ("web_image_cache_misses_total", "counter", "Rendered image cache misses", None, images["misses"]),
+        ("groq_clients", "gauge", "Pooled Groq clients", None, clients["clients"]),
+        ("groq_clients_reused_total", "counter", "Requests served by an existing Groq client", None,
+         clients["reused"]),
+        ("prefetch_submitted_total", "counter", "Prefetch tasks submitted", None, prefetch["submitted"]),
+        ("prefetch_cancelled_total", "counter", "Queued prefetch tasks cancelled as stale", None,
+         prefetch["cancelled"]),
+    ]
+
+metrics.registry.register_collector(_web_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format; like /health, left unauthenticated for scrapers
+    import batch_processor  # registers the pipeline collectors (caches, governor, hedging)
+    return app.response_class(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache_stats')
+def cache_stats():
+    from ocr_cache import all_cache_stats
+    from payload_cache import get_payload_cache
+    payload_cache = get_payload_cache()
+    return jsonify({
+        'ocr_result_cache': all_cache_stats(),
+        'payload_cache': payload_cache.stats() if payload_cache else None,
+        'image_cache': image_cache.stats(),
+        'groq_clients': groq_clients.stats(),
+        'prefetch': prefetcher.stats(),
+        'singleflight': ocr_flights.stats(),
+        'hedging': get_hedge_policy().snapshot(),
+        'sessions': sessions.stats() if sessions else None
+    })
+
 @app.route('/get_models', methods=['POST'])
 def get_models():
     api_key = request.json.get('api_key') if request.json else None
@@ -186,37 +409,11 @@ def get_models():
         return jsonify({'error': 'API key required'})
     
     try:
-        temp_client = Groq(api_key=api_key)
-        logging.info("Fetching available models...")
-        models = temp_client.models.list()
-        logging.debug(f"Models response type: {type(models)}")
-        logging.debug(f"Models response: {models}")
-        
-        # Try different ways to access models
-        if hasattr(models, 'data'):
-            model_list = models.data
-            print(f"Using models.data - Found {len(model_list)} models")
-        else:
-            model_list = models
-            logging.info(f"Using models directly - Found {len(model_list)} models")
-            
-        all_models = [model.id for model in model_list]
-        logging.info(f"All models: {all_models}")
-        # Include models that can handle vision tasks
-        vision_keywords = ['vision', 'scout', 'llama-4', 'llama-3.3', 'llama3-70b', 'compound']
-        vision_models = [model.id for model in model_list if any(keyword in model.id.lower() for keyword in vision_keywords)]
-        print(f"Vision models: {vision_models}")
-        
-        # Add processing modes
-        processing_modes = [
-            {'value': 'poem', 'label': 'Student Poems (SUN Room)'},
-            {'value': 'freeform', 'label': 'Free Form OCR'},
-            {'value': 'zip_ode_explain', 'label': 'Zipcode (Zip Ode)'},
-            {'value': 'custom_poem', 'label': 'Custom Poem'},
-            {'value': 'postcard_poem', 'label': 'Post Card Poem'},
-            {'value': 'worksheet_poem', 'label': 'Worksheet Poem'},
-            {'value': 'survey_form', 'label': 'Non-Poem Survey Form'}
-        ]
+        # Shared client and TTL-cached model list: no new TLS handshake or models.list() per page load
+        vision_models = groq_clients.list_vision_models(api_key)
+        logging.info(f"Vision models: {vision_models}")
+        
+        processing_modes = [mode.to_json() for mode in processing_modes_registry.modes()]
         
         return jsonify({'models': vision_models, 'processing_modes': processing_modes})
     except Exception as e:
@@ -225,65 +422,118 @@ def get_models():
 
 @app.route('/get_custom_settings', methods=['GET'])
 def get_custom_settings():
-    try:
-        with open('custom_poem_settings.json', 'r') as f:
-            data = json.load(f)
-        return jsonify(data['custom_poem'])
-    except (FileNotFoundError, KeyError):
-        return jsonify({
-            "name": "Custom Poem",
-            "description": "User-defined poem structure and content",
-            "structure": "Free verse with custom requirements",
-            "document_contains": ["Student name", "School name", "Poem text"]
-        })
+    return jsonify(processing_modes_registry.custom_settings())
 
 @app.route('/save_custom_settings', methods=['POST'])
 def save_custom_settings():
     try:
-        settings = request.json
-        settings['prompt_template'] = (
-            "Transcribe everything in this image including {document_contains}. "
-            "Preserve exact formatting, line breaks, and punctuation. "
-            "Use [?] for unclear words. At the end, add exactly these lines:\n"
-            "POEM_TITLE: [actual title]\n"
-            "POEM_THEME: [theme]\n"
-            "POEM_LANGUAGE: [language]\n"
-            "CUSTOM_STRUCTURE: {structure}\n"
-            "Confidence: X/10"
-        )
-        
-        data = {'custom_poem': settings}
-        with open('custom_poem_settings.json', 'w') as f:
-            json.dump(data, f, indent=2)
-        
+        processing_modes_registry.save_custom_settings(request.json)
         return jsonify({'success': 'Settings saved successfully'})
     except Exception as e:
         return jsonify({'error': f'Failed to save settings: {str(e)}'}), 500
 
 @app.route('/batch_process', methods=['POST'])
 def batch_process():
+    """Start a batch run as a background job and return its ID"""
     # Get API key from request
-    api_key = request.json.get('api_key') if request.json else None
+    req_json = request.json or {}
+    api_key = req_json.get('api_key')
     if not api_key:
         return jsonify({'error': 'API key required for batch processing'})
     
     try:
-        from batch_processor import BatchImageProcessor
+        from batch_processor import BatchImageProcessor, default_worker_count
         
         upload_dir = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
         output_dir = os.environ.get('OUTPUT_DIRECTORY', os.getcwd())
         
-        processor = BatchImageProcessor(upload_dir, api_key)
-        results = processor.process_directory(upload_dir, output_dir)
+        # Clients may ask for fewer workers than BATCH_WORKERS, never more
+        max_workers = default_worker_count()
+        try:
+            workers = int(req_json.get('workers') or max_workers)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'workers must be a positive integer'}), 400
+        workers = min(max(workers, 1), max_workers)
+        output_format = req_json.get('output_format', 'json')
+        if output_format not in ('json', 'jsonl'):
+            return jsonify({'error': f'Unknown output_format: {output_format}'})
+        resume = bool(req_json.get('resume'))
+        try:
+            pack_size = int(req_json['pack_size']) if req_json.get('pack_size') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'pack_size must be a positive integer'})
+        
+        processor = BatchImageProcessor(upload_dir, api_key, cache_directory=output_dir)
         
+        def run(job):
+            processor.process_directory(upload_dir, output_dir, max_workers=workers, resume=resume,
+                                        output_format=output_format, cancel_event=job.cancel_event,
+                                        progress_callback=job.record_progress, pack_size=pack_size)
+        
+        job = job_manager.submit(run, description=f"Batch OCR of {upload_dir}")
         return jsonify({
-            'success': f'Processed {len(results)} images',
-            'results': len(results)
-        })
+            'success': 'Batch job started',
+            'job_id': job.id,
+            'status_url': url_for('batch_job_status', job_id=job.id),
+            'events_url': url_for('batch_job_events', job_id=job.id)
+        }), 202
         
     except Exception as e:
         return jsonify({'error': f'Batch processing failed: {str(e)}'}), 500
 
+@app.route('/batch_jobs/<job_id>')
+def batch_job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/batch_jobs/<job_id>/results')
+def batch_job_results(job_id):
+    """Per-image results produced so far; ?offset=N returns only newer ones"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    return jsonify({'job_id': job.id, 'status': job.status, 'offset': offset,
+                    'results': job.results_since(offset)})
+
+@app.route('/batch_jobs/<job_id>/cancel', methods=['POST'])
+def batch_job_cancel(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/batch_jobs/<job_id>/events')
+def batch_job_events(job_id):
+    """Server-Sent Events stream of status and per-image progress until the job finishes"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    last_seq = request.headers.get('Last-Event-ID', 0, type=int)
+    
+    def stream():
+        seq = last_seq
+        # Current state first, so late subscribers can render immediately
+        yield f"event: status\ndata: {json.dumps(job.snapshot())}\n\n"
+        while True:
+            events = job.events_after(seq, timeout=15)
+            if not events:
+                if job.finished:
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            for seq, event_type, data in events:
+                yield f"id: {seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+            if job.finished and not job.events_after(seq):
+                break
+    
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/')
 def index():
     # Ensure required directories exist
@@ -347,19 +597,67 @@ def get_image_info():
             image_path = fresh_images[0]
         
         try:
-            image_base64 = image_to_base64(image_path)
-            return jsonify({
-                'image_base64': image_base64,
-                'filename': os.path.basename(image_path),
-                'index': current_index + 1,
-                'total': len(current_images)
-            })
+            info = image_info(image_path, current_index + 1, len(current_images))
+            schedule_prefetch(SessionManager.get_current_images(), current_index,
+                              **_prefetch_options(request.get_json(silent=True)))
+            return jsonify(info)
         except Exception as e:
             logging.error(f"Error loading image {image_path}: {e}")
             return jsonify({'error': f'Error loading image: {str(e)}'})
     
     return jsonify({'error': 'Invalid image index'})
 
+@app.route('/image/<image_id>')
+def get_image(image_id):
+    """Serve an upload (or a cached display rendition of it) with ETag/Last-Modified validators"""
+    # Names are served as listed (spaces, accents); only files in the upload index are reachable
+    filename = os.path.basename(image_id)
+    upload_dir = os.environ.get('UPLOAD_DIRECTORY', os.getcwd())
+    image_path = os.path.join(upload_dir, filename)
+    try:
+        listed = image_path in get_upload_index(upload_dir).images()
+    except OSError:
+        listed = False
+    if not filename or not listed or not os.path.isfile(image_path):
+        return jsonify({'error': 'Image not found'}), 404
+    
+    size = request.args.get('size', 'original')
+    if size != 'original' and size not in IMAGE_RENDITIONS:
+        return jsonify({'error': f'Unknown size: {size}'}), 400
+    
+    try:
+        etag = image_etag(image_path, size)
+        last_modified = os.path.getmtime(image_path)
+        # Answer revalidations without touching the image bytes
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+        
+        if size == 'original':
+            data = image_cache.get_or_load(image_path, _read_bytes, variant='original')
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        else:
+            data = image_cache.get_or_load(image_path, _render(IMAGE_RENDITIONS[size]), variant=size)
+            mimetype = 'image/jpeg'
+    except (IOError, OSError) as e:
+        logging.error(f"Error loading image {image_path}: {e}")
+        return jsonify({'error': f'Error loading image: {str(e)}'}), 500
+    
+    response = send_file(io.BytesIO(data), mimetype=mimetype, etag=etag,
+                         last_modified=last_modified, conditional=True)
+    # Files can be rotated in place: let browsers cache but always revalidate
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = None
+    return response
+
+@app.route('/pdf_progress')
+def pdf_progress():
+    """Per-PDF page rendering progress for uploads still being rasterized"""
+    with _pdfs_lock:
+        return jsonify({'pdfs': {name: dict(progress) for name, progress in _pdf_progress.items()}})
+
 @app.route('/navigate', methods=['POST'])
 def navigate():
     current_images = SessionManager.get_current_images()
@@ -395,38 +693,26 @@ def convert_text():
         
         image_path = current_images[current_index]
         
-        # Use BatchImageProcessor for consistent logic
-        processor = BatchImageProcessor(os.path.dirname(image_path), api_key)
+        # Use BatchImageProcessor for consistent logic (and the shared OCR result cache)
+        processor = BatchImageProcessor(os.path.dirname(image_path), api_key,
+                                        cache_directory=os.environ.get('OUTPUT_DIRECTORY', os.getcwd()))
+        # A speculative OCR of this image that is already running lands in the OCR cache: let it finish
+        # instead of paying twice (a queued one is cancelled and converted right here)
+        if prefetcher.enabled:
+            prefetcher.wait('ocr', image_path, variant=(model, processing_mode), timeout=60, owner=_prefetch_owner())
         converted_text = processor.convert_image_to_text(image_path, model, processing_mode)
         
         if converted_text.startswith('Error processing'):
+            metrics.ERRORS.inc(stage="web", error="ConversionError")
             return jsonify({'error': converted_text})
+        schedule_prefetch(current_images, current_index, api_key, model, processing_mode)
         
-        # Extract student info using appropriate logic based on processing mode
-        if processing_mode == "zip_ode_explain":
-            parsed = processor.parse_zip_ode_response(converted_text)
-            info = StudentInfo(
-                student_name=parsed["student_name"],
-                school_name=parsed["school_name"],
-                poem_title=parsed["poem_title"],
-                poem_theme=parsed["poem_theme"],
-                poem_language=parsed["poem_language"]
-            )
-        else:
-            info = processor.extract_student_info_legacy(converted_text)
-        
-        # Extract confidence score and clean text in single pass
-        lines = converted_text.split('\n')
-        confidence_score = ""
-        clean_lines = []
-        
-        for line in lines:
-            if line.startswith('Confidence:') or line.strip().startswith('(Confidence:'):
-                confidence_score = line.strip()
-            else:
-                clean_lines.append(line)
-        
-        clean_text = '\n'.join(clean_lines)
+        # Parse once: fields, confidence line and display text in a single pass
+        with metrics.PARSE_SECONDS.time(mode=processing_mode):
+            record = parse_response(converted_text, processing_mode)
+        info = record.student_info()
+        clean_text = record.text
+        confidence_score = record.confidence
         
         return jsonify({
             'text': clean_text,
@@ -435,10 +721,12 @@ def convert_text():
             'poem_title': info.poem_title,
             'poem_theme': info.poem_theme,
             'poem_language': info.poem_language,
-            'confidence_score': confidence_score
+            'confidence_score': confidence_score,
+            'fields': record.fields
         })
         
     except Exception as e:
+        metrics.ERRORS.inc(stage="web", error=type(e).__name__)
         error_msg = str(e)
         if 'rate limit' in error_msg.lower():
             return jsonify({'error': 'API rate limit exceeded. Please wait and try again.'})
@@ -515,13 +803,23 @@ def upload_image():
                 except Exception as e:
                     logging.error(f"Error resizing image: {e}")
 
-            # If PDF, extract images
+            # If PDF, render the first page now and stream the rest in the background
             if filename.lower().endswith('.pdf'):
-                extracted = extract_images_from_pdf(upload_path)
+                with _pdfs_lock:
+                    _pdfs_scheduled.add(upload_path)
+                    _pdf_progress[filename] = {'pages_done': 0, 'pages_total': None, 'status': 'rendering'}
+                extracted = extract_images_from_pdf(upload_path, first_page=1, last_page=1,
+                                                    progress_callback=_record_pdf_page(upload_path),
+                                                    move_when_done=False)
                 if not extracted:
+                    with _pdfs_lock:
+                        _pdfs_scheduled.discard(upload_path)
+                        _pdf_progress[filename]['status'] = 'failed'
                     return jsonify({'error': 'Failed to extract images from PDF'})
+                _pdf_executor.submit(_extract_pdf_in_background, upload_path, 2)
 
             # Refresh image list and find the uploaded file
+            get_upload_index(upload_dir).invalidate()
             current_images = get_image_files()
             SessionManager.set_current_images(current_images)
             if not current_images:
@@ -532,7 +830,7 @@ def upload_image():
             if filename.lower().endswith('.pdf'):
                 # For PDFs, show the first extracted page
                 base_name = os.path.splitext(filename)[0]
-                uploaded_file = f"{os.environ.get('UPLOAD_DIRECTORY', os.getcwd())}/{base_name}_page_1.png"
+                uploaded_file = os.path.join(upload_dir, f"{base_name}_page_1.jpg")
             
             # Set current_index to the uploaded file
             try:
@@ -567,8 +865,8 @@ def rotate_image():
             
             rotated.save(image_path)
         
-        # Clear the cache for this image to force refresh
-        image_to_base64.cache_clear()
+        # Drop this image's cached forms to force refresh
+        image_cache.invalidate(image_path)
         
         return get_image_info()
         
@@ -755,10 +1053,11 @@ def save_text():
                     logging.error(f"Move verification failed. Source exists: {os.path.exists(current_image_path)}, Dest exists: {os.path.exists(new_image_path)}")
                     return jsonify({'error': 'Image move verification failed'})
                 
-                # Clear image cache since file path changed
-                image_to_base64.cache_clear()
+                # Drop the moved image from the cache since its path changed
+                image_cache.invalidate(current_image_path)
                 
                 # Update session with new image list
+                get_upload_index(upload_dir).invalidate()
                 updated_images = get_image_files()
                 logging.info(f"Before update - Current images: {len(current_images)}")
                 logging.info(f"After move - Updated images: {len(updated_images)}")
@@ -828,6 +1127,9 @@ def cleanup_old_files():
                 continue
                 
             for filename in os.listdir(directory):
+                if filename.startswith('.'):
+                    # Hidden files hold persistent state such as the OCR result cache
+                    continue
                 file_path = os.path.join(directory, filename)
                 try:
                     if os.path.getmtime(file_path) < cutoff_time:
@@ -839,7 +1141,6 @@ def cleanup_old_files():
         logging.error(f"Error during cleanup: {e}")
 
 # Run cleanup every hour
-import threading
 def periodic_cleanup():
     while True:
         time.sleep(3600)  # 1 hour